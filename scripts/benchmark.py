@@ -0,0 +1,610 @@
+import argparse
+from datetime import datetime, timezone
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from pathlib import Path
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from scripts.etl_process import run, run_batch
+from src.batch import RunSpec
+from src.cache import ExtractionCache
+from src.downloaders import HttpDownloader
+from src.excel import calamine_available
+from src.exports import SqliteCsvExporter
+from src.extractors import BaseExtractor, CachedExtractor, ColumnarExtractor, CsvExtractor, ExcelExtractor, SqliteExtractor
+from src.lazy import LazyFrame
+from src.loaders import BaseLoader, ColumnarLoader, CsvLoader, SqliteLoader
+from src.parsers import YamlParser
+from src.partitions import PartitionedAggregateTransformer
+from src.queries import QueryService
+from src.synthetic import BASE_COUNTRIES, SyntheticDataGenerator, synthetic_merge_inputs
+from src.tranformers import (AggregateTransformer, BaseTransformer, CountryLookupTransformer, EmissionsTransformer,
+                             EnergyTransformer, MergeTransformer, PibTransformer, PopulationTransformer)
+from src.utils import generate_file_path, generate_output_path
+
+YAML_FILE = 'config.yml'
+RESULTS_DIR = Path('benchmarks') / 'results'
+BASE_YEARS = 25
+REGRESSION_THRESHOLD = 1.2
+ENTRY_POINTS = ['scripts.check', 'scripts.data_download', 'scripts.etl_process']
+HEAVY_MODULES = ('pandas', 'numpy', 'pyarrow', 'sqlalchemy', 'yaml', 'requests', 'openpyxl')
+# Run in a fresh interpreter, so every import is timed from scratch
+STARTUP_CODE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+from src.parsers import YamlParser
+YamlParser.load_yaml({yaml_file!r})
+print(json.dumps({{'elapsed': time.perf_counter() - start, 'modules': [name for name in {modules!r} if name in sys.modules]}}))
+"""
+
+
+def measure(func, *args) -> tuple[object, float, int]:
+    """Run a function measuring its wall time and its peak traced memory.
+
+    Args:
+        func (Callable): Function to be measured
+        *args: Arguments of the function
+
+    Returns:
+        tuple[object, float, int]: Function result, elapsed seconds and peak bytes
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def scaled_dimensions(scale: float) -> tuple[int, int]:
+    """Split a scale factor evenly between countries and years.
+
+    Args:
+        scale (float): Scale factor over the real datasets
+
+    Returns:
+        tuple[int, int]: Number of countries and years
+    """
+    factor = np.sqrt(scale)
+    return int(BASE_COUNTRIES * factor), int(BASE_YEARS * factor)
+
+def legacy_merge(energy_df: pd.DataFrame, emissions_df: pd.DataFrame, pib_df: pd.DataFrame, population_df: pd.DataFrame) -> pd.DataFrame:
+    """Reference implementation with chained string-keyed merges."""
+    keys = ['Country Code', 'Country Name', 'Year']
+    first_columns = ['Country Code', 'Country Name', 'Continent', 'Year', 'Population', 'pib']
+    merged_df = pd.merge(energy_df, emissions_df, how='inner', on=keys)
+    merged_df = pd.merge(merged_df, pib_df, how='inner', on=keys)
+    merged_df = pd.merge(merged_df, population_df, how='inner', on=['Country Code', 'Country Name'])
+    merged_df = merged_df[[c for c in first_columns if c in merged_df.columns] + [c for c in merged_df.columns if c not in first_columns]]
+    per_capita_columns = [col for col in merged_df.columns if col not in first_columns]
+    merged_df[[f'{col} per Capita' for col in per_capita_columns]] = merged_df[per_capita_columns].div(merged_df['Population'], axis=0)
+    return merged_df
+
+def legacy_emissions(emissions_df: pd.DataFrame, population_df: pd.DataFrame) -> pd.DataFrame:
+    """Reference implementation with DataFrame.pivot and a merge on country names."""
+    df = emissions_df.pivot(columns='category', values='value', index=['country_or_area', 'year']).reset_index()
+    na_counts = df.isna().sum()
+    df = df.drop(columns=na_counts[na_counts > 200].index.tolist())
+    df = df.dropna(subset=['country_or_area'])
+    columns = ['Country Code', 'Country Name'] + df.columns.tolist()
+    df = pd.merge(df, population_df[['Country Code', 'Country Name']], how='left', left_on=['country_or_area'], right_on=['Country Name'])
+    df = df[columns].drop(columns='country_or_area')
+    return df.rename(columns=EmissionsTransformer.emission_mapper)
+
+def legacy_energy(energy_df: pd.DataFrame) -> pd.DataFrame:
+    """Reference implementation with DataFrame.melt over the string year columns."""
+    df = energy_df[['Country Code', 'Country Name'] + [str(year) for year in range(1990, 2015)]]
+    df = df.melt(id_vars=['Country Code', 'Country Name'], var_name='Year', value_name='Energy')
+    df = df.dropna(subset=['Energy'])
+    df['Year'] = df['Year'].astype(int)
+    return df
+
+def report(name: str, elapsed: float, peak: int):
+    print(f'{name:<32} {elapsed * 1000:>10.1f} ms {peak / 2**20:>10.1f} MiB')
+
+def benchmark_merge(scale: float):
+    n_countries, n_years = scaled_dimensions(scale)
+    inputs = synthetic_merge_inputs(n_countries, n_years)
+    print(f'Merge benchmark: {n_countries} countries x {n_years} years ({len(inputs[0])} energy rows)')
+
+    expected, elapsed, peak = measure(legacy_merge, *inputs)
+    report('legacy', elapsed, peak)
+    result, elapsed, peak = measure(lambda *dfs: MergeTransformer(*dfs).transform(), *inputs)
+    report('merge', elapsed, peak)
+
+    pd.testing.assert_frame_equal(result, expected)
+
+def benchmark_reshape(scale: float, seed: int):
+    generator = SyntheticDataGenerator(None, scale, seed)
+    emissions_df, energy_df = generator.emissions_df(), generator.energy_df()
+    population_df = PopulationTransformer(generator.population_df()).transform()
+    print(f'Reshape benchmark: {generator.n_countries} countries ({len(emissions_df)} emissions rows)')
+
+    expected, elapsed, peak = measure(legacy_emissions, emissions_df, population_df)
+    report('legacy emissions', elapsed, peak)
+    result, elapsed, peak = measure(lambda df: EmissionsTransformer(df, population_df).transform(), emissions_df)
+    report('emissions', elapsed, peak)
+    pd.testing.assert_frame_equal(result, expected)
+
+    expected, elapsed, peak = measure(legacy_energy, energy_df)
+    report('legacy energy', elapsed, peak)
+    result, elapsed, peak = measure(lambda df: EnergyTransformer(df).transform(), energy_df)
+    report('energy', elapsed, peak)
+    pd.testing.assert_frame_equal(result, expected)
+
+def benchmark_pushdown(scale: float, seed: int):
+    config = YamlParser.load_yaml(YAML_FILE)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        generator = SyntheticDataGenerator(Path(tmp_dir) / 'data', scale, seed)
+        config = generator.write_all(config)
+        print(f'Pushdown benchmark: {generator.n_countries} countries (scale {scale})')
+
+        cases = [('energy', ExcelExtractor('renewable_energy'), 'renewable_energy', EnergyTransformer),
+                 ('pib', ExcelExtractor('pib'), 'pib', PibTransformer)]
+        for name, extractor, source, transformer in cases:
+            file_path = generate_file_path(config, source)
+            expected, elapsed, peak = measure(lambda: transformer(extractor.extract(file_path)).transform())
+            report(f'{name} eager', elapsed, peak)
+            result, elapsed, peak = measure(lambda: transformer(LazyFrame(partial(extractor.scan, file_path))).transform())
+            report(f'{name} lazy', elapsed, peak)
+            pd.testing.assert_frame_equal(result, expected)
+
+def benchmark_excel(scale: float, seed: int):
+    config = YamlParser.load_yaml(YAML_FILE)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        generator = SyntheticDataGenerator(Path(tmp_dir) / 'data', scale, seed)
+        config = generator.write_all(config)
+        print(f'Excel benchmark: {generator.n_countries} countries (scale {scale})')
+
+        engines = ['pandas', 'streaming'] + (['calamine'] if calamine_available() else [])
+        cases = [('energy', 'renewable_energy', None),
+                 ('pib', 'pib', ['countrycode', 'country', 'year', 'gdppc'])]
+        for name, source, columns in cases:
+            file_path = generate_file_path(config, source)
+            expected = None
+            for engine in engines:
+                extractor = ExcelExtractor(source, engine)
+                result, elapsed, peak = measure(extractor.extract, file_path)
+                report(f'{name} {engine}', elapsed, peak)
+                if expected is None:
+                    expected = result
+                pd.testing.assert_frame_equal(result, expected)
+                if columns is not None:
+                    result, elapsed, peak = measure(extractor.scan, file_path, columns)
+                    report(f'{name} {engine} projected', elapsed, peak)
+                    pd.testing.assert_frame_equal(result, expected[columns])
+
+def read_tables(db_path: Path) -> dict[str, pd.DataFrame]:
+    extractor = SqliteExtractor(db_path)
+    tables = extractor.extract(f"SELECT name FROM sqlite_master WHERE type = 'table' AND name != '{SqliteLoader.GENERATIONS_TABLE}'")
+    return {table: extractor.extract(f'SELECT * FROM "{table}"') for table in tables['name']}
+
+def benchmark_batch(scale: float, seed: int):
+    config = YamlParser.load_yaml(YAML_FILE)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        generator = SyntheticDataGenerator(Path(tmp_dir) / 'data', scale, seed)
+        config = generator.write_all(config)
+        config['cache']['enabled'] = False
+        config['incremental']['enabled'] = False
+        specs = [RunSpec.from_config(run_config) for run_config in config['batch']['runs']]
+        print(f'Batch benchmark: {len(specs)} runs, {generator.n_countries} countries (scale {scale})')
+
+        # Reference: every run extracting its own sources, one after the other
+        _, elapsed, peak = measure(lambda: [run(spec.apply(config)) for spec in specs])
+        report('sequential runs', elapsed, peak)
+        expected = read_tables(generate_output_path(config, 'db'))
+
+        # Peak memory of the parent process only, the workers are not traced
+        config['data_dir']['outputs']['database'] = 'batch.db'
+        written, elapsed, peak = measure(run_batch, config, specs)
+        report('batch', elapsed, peak)
+        result = read_tables(generate_output_path(config, 'db'))
+        assert sorted(written) == sorted(expected) == sorted(result)
+        for table, df in expected.items():
+            pd.testing.assert_frame_equal(result[table], df)
+
+def report_latency(name: str, latencies: list[float]):
+    latencies = np.array(latencies) * 1000
+    print(f'{name:<32} p50 {np.percentile(latencies, 50):>8.2f} ms p95 {np.percentile(latencies, 95):>8.2f} ms')
+
+def benchmark_queries(scale: float, repeat: int):
+    config = YamlParser.load_yaml(YAML_FILE)
+    loader_config = config.get('loader', {})
+    n_countries, n_years = scaled_dimensions(scale)
+    merged_df = MergeTransformer(*synthetic_merge_inputs(n_countries, n_years)).transform()
+    print(f'Query benchmark: {len(merged_df)} merged rows ({n_countries} countries x {n_years} years)')
+
+    rng = np.random.default_rng(0)
+    codes = merged_df['Country Code'].unique()
+    continents = merged_df['Continent'].unique()
+    first_year = int(merged_df['Year'].min())
+    filters = [{'countries': list(rng.choice(codes, 5, replace=False))},
+               {'continents': [continents[0]], 'years': (first_year, first_year + 4)},
+               {'countries': list(rng.choice(codes, 20, replace=False)), 'years': (first_year + 5, None)}]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / 'benchmark.db'
+        loader = SqliteLoader(db_path, batch_size=loader_config.get('batch_size', 1000), indexes=loader_config.get('indexes'))
+        loader.load(merged_df, 'merged')
+        queries = QueryService(db_path)
+
+        # Reference: whole table read, filtered in pandas
+        legacy, cold, hot = [], [], []
+        for _ in range(repeat):
+            for query_filters in filters:
+                start = time.perf_counter()
+                df = SqliteExtractor(db_path).extract('SELECT * FROM merged')
+                expected = df[filter_mask(df, query_filters)].reset_index(drop=True)
+                legacy.append(time.perf_counter() - start)
+
+                queries.clear_cache()
+                start = time.perf_counter()
+                result = queries.query('merged', **query_filters)
+                cold.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                queries.query('merged', **query_filters)
+                hot.append(time.perf_counter() - start)
+                pd.testing.assert_frame_equal(result, expected)
+
+        report_latency('full read + pandas filter', legacy)
+        report_latency('query cold', cold)
+        report_latency('query hot', hot)
+
+        # A new generation of the table invalidates the cached results
+        loader.load(merged_df, 'merged')
+        queries.query('merged', **filters[0])
+        print(f'Cache hits {queries.hits}, misses {queries.misses} (last query after a reload)')
+
+def benchmark_startup(repeat: int, scale: float):
+    print(f'Startup benchmark: whole process and startup (imports and config load) of every entry point ({repeat} runs)')
+    for module in ENTRY_POINTS:
+        code = STARTUP_CODE.format(module=module, yaml_file=YAML_FILE, modules=HEAVY_MODULES)
+        processes, imports = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+            processes.append(time.perf_counter() - start)
+            result = json.loads(output)
+            imports.append(result['elapsed'])
+        report_latency(f'{module} process', processes)
+        report_latency(f'{module} startup', imports)
+        print(f"{'':<32} loads {', '.join(result['modules']) or 'no heavy modules'}")
+
+    n_countries, n_years = scaled_dimensions(scale)
+    countries_df, continents_df = AggregateTransformer(MergeTransformer(*synthetic_merge_inputs(n_countries, n_years)).transform()).transform()
+    print(f'CSV export: {len(countries_df)} countries, {len(continents_df)} continents')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_path = Path(tmp_dir)
+        loader = SqliteLoader(tmp_path / 'benchmark.db')
+        loader.load(countries_df, 'countries')
+        loader.load(continents_df, 'continents')
+
+        def pandas_export():
+            queries = QueryService(tmp_path / 'benchmark.db')
+            for table in ['countries', 'continents']:
+                CsvLoader().load(queries.query(table), tmp_path / f'{table}_pandas.csv')
+
+        def sqlite3_export():
+            exporter = SqliteCsvExporter(tmp_path / 'benchmark.db')
+            for table in ['countries', 'continents']:
+                exporter.export(table, tmp_path / f'{table}_sqlite3.csv')
+
+        # Reference: the tables read through QueryService and written with pandas
+        _, elapsed, peak = measure(pandas_export)
+        report('pandas export', elapsed, peak)
+        _, elapsed, peak = measure(sqlite3_export)
+        report('sqlite3 export', elapsed, peak)
+        for table in ['countries', 'continents']:
+            assert (tmp_path / f'{table}_sqlite3.csv').read_bytes() == (tmp_path / f'{table}_pandas.csv').read_bytes()
+
+class SourceHandler(BaseHTTPRequestHandler):
+    """Serves the file of the server with an ETag, conditional requests and byte ranges.
+
+    `interrupt_at` closes the connection after that many body bytes, `misaligned` answers
+    range requests with the whole file as a 206. Every status sent is recorded.
+    """
+
+    def do_GET(self):
+        server = self.server
+        if self.headers.get('If-None-Match') == server.etag:
+            return self.__send(304)
+
+        start = 0
+        byte_range = self.headers.get('Range')
+        if byte_range and self.headers.get('If-Range', server.etag) == server.etag:
+            start = 0 if server.misaligned else int(byte_range.removeprefix('bytes=').rstrip('-'))
+            if start >= len(server.content):
+                return self.__send(416, headers={'Content-Range': f'bytes */{len(server.content)}'})
+            end = len(server.content) - 1
+            return self.__send(206, memoryview(server.content)[start:], {'Content-Range': f'bytes {start}-{end}/{len(server.content)}'})
+        return self.__send(200, server.content)
+
+    def log_message(self, format, *args):
+        pass
+
+    def __send(self, status: int, body: bytes | memoryview = b'', headers: dict | None = None):
+        server = self.server
+        server.statuses.append(status)
+        self.send_response(status)
+        self.send_header('ETag', server.etag)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if server.interrupt_at is not None:
+            body = body[:server.interrupt_at]
+            server.interrupt_at = None
+        try:
+            self.wfile.write(body)
+        except ConnectionError:
+            # Clients give up on responses they cannot use
+            pass
+
+def benchmark_download(size: float):
+    import requests
+
+    content = np.random.default_rng(0).bytes(int(size * 2**20))
+    print(f'Download benchmark: {size:g} MiB file from a local server')
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SourceHandler)
+    server.content, server.etag, server.interrupt_at, server.misaligned, server.statuses = content, '"v1"', None, False, []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/source.csv'
+
+    def step(name: str, expected_statuses: list[int], expected_result: bool):
+        server.statuses.clear()
+        result, elapsed, peak = measure(downloader.download, url, file_path)
+        report(name, elapsed, peak)
+        assert server.statuses == expected_statuses, f'{name}: server answered {server.statuses}'
+        assert result == expected_result and file_path.read_bytes() == content and not part_path.exists()
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = Path(tmp_dir) / 'source.csv'
+            part_path = Path(tmp_dir) / 'source.csv.part'
+            downloader = HttpDownloader(Path(tmp_dir) / 'manifest.json')
+
+            step('full download (200)', [200], True)
+            step('unchanged (304)', [304], False)
+
+            # A changed file is downloaded again, the transfer breaks halfway and is resumed
+            server.etag, server.interrupt_at = '"v2"', len(content) // 2
+            file_path.unlink()
+            try:
+                downloader.download(url, file_path)
+            except requests.RequestException:
+                pass
+            assert part_path.stat().st_size == len(content) // 2
+            step('resume (206)', [206], True)
+
+            # A partial file as long as the remote one has nothing left to request
+            server.etag = '"v3"'
+            file_path.unlink()
+            part_path.write_bytes(content)
+            downloader.manifest[str(file_path)] = {'url': url, 'partial': {'etag': server.etag}}
+            step('complete partial file (416)', [416, 200], True)
+
+            # A server ignoring the offset of the range is not appended to the partial file
+            part_path.write_bytes(content[:1000])
+            downloader.manifest[str(file_path)] = {'url': url, 'partial': {'etag': server.etag}}
+            server.misaligned = True
+            step('misaligned range (206)', [206, 200], True)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def filter_mask(df: pd.DataFrame, filters: dict) -> pd.Series:
+    mask = pd.Series(True, index=df.index)
+    if 'countries' in filters:
+        mask &= df['Country Code'].isin(filters['countries'])
+    if 'continents' in filters:
+        mask &= df['Continent'].isin(filters['continents'])
+    if 'years' in filters:
+        first_year, last_year = filters['years']
+        mask &= df['Year'].between(first_year if first_year is not None else -np.inf, last_year if last_year is not None else np.inf)
+    return mask
+
+def all_subclasses(base: type) -> set[type]:
+    subclasses = set(base.__subclasses__())
+    return subclasses.union(*(all_subclasses(subclass) for subclass in subclasses))
+
+def run_pipeline_benchmark(config: dict, work_dir: Path) -> list[dict]:
+    """Measure every extractor, transformer and loader over the sources of a config.
+
+    Args:
+        config (dict): Configuration dictionary pointing to the benchmark sources
+        work_dir (Path): Directory for the benchmark outputs
+
+    Returns:
+        list[dict]: One result per measured stage
+    """
+    results = []
+
+    def run(stage: str, component: type, func, *args):
+        output, elapsed, peak = measure(func, *args)
+        first_output = output[0] if isinstance(output, tuple) else output
+        rows = len(first_output) if isinstance(first_output, pd.DataFrame) else None
+        results.append({'stage': stage, 'component': component.__name__, 'seconds': elapsed, 'peak_bytes': peak, 'rows': rows})
+        report(stage, elapsed, peak)
+        return output
+
+    # Extract
+    paths = {source: generate_file_path(config, source) for source in config['data_sources']}
+    emissions_read = config['data_dir']['global_emissions'].get('read', {})
+    emissions_df = run('extract.global_emissions', CsvExtractor, CsvExtractor(member=emissions_read.get('member')).extract, paths['global_emissions'])
+    population_df = run('extract.population', CsvExtractor, CsvExtractor().extract, paths['population'])
+    pib_df = run('extract.pib', ExcelExtractor, ExcelExtractor('pib').extract, paths['pib'])
+    energy_df = run('extract.renewable_energy', ExcelExtractor, ExcelExtractor('renewable_energy').extract, paths['renewable_energy'])
+
+    cache = ExtractionCache(work_dir / 'cache')
+    cached_extractor = CachedExtractor(ExcelExtractor('pib'), cache)
+    run('extract.pib.cache_cold', CachedExtractor, cached_extractor.extract, paths['pib'])
+    run('extract.pib.cache_hot', CachedExtractor, cached_extractor.extract, paths['pib'])
+
+    # Transform
+    population_df = run('transform.population', PopulationTransformer, lambda df: PopulationTransformer(df).transform(), population_df)
+    lookup_df = run('transform.country_lookup', CountryLookupTransformer,
+                    lambda *dfs: CountryLookupTransformer(*dfs).transform(), population_df, energy_df)
+    energy_df = run('transform.energy', EnergyTransformer, lambda df: EnergyTransformer(df).transform(), energy_df)
+    emissions_df = run('transform.emissions', EmissionsTransformer,
+                       lambda df: EmissionsTransformer(df, population_df, lookup_df).transform(), emissions_df)
+    pib_df = run('transform.pib', PibTransformer, lambda df: PibTransformer(df, lookup_df).transform(), pib_df)
+    merged_df = run('transform.merge', MergeTransformer,
+                    lambda *dfs: MergeTransformer(*dfs).transform(), energy_df, emissions_df, pib_df, population_df, lookup_df)
+    countries_df, continents_df = run('transform.aggregate', AggregateTransformer, lambda df: AggregateTransformer(df).transform(), merged_df)
+    run('transform.partitioned', PartitionedAggregateTransformer,
+        lambda *dfs: PartitionedAggregateTransformer(*dfs).transform(), energy_df, emissions_df, pib_df, population_df, lookup_df)
+
+    # Load
+    db_path = work_dir / 'benchmark.db'
+    sqlite_loader = SqliteLoader(db_path, batch_size=config.get('loader', {}).get('batch_size', 1000))
+    run('load.sqlite', SqliteLoader, sqlite_loader.load, merged_df, 'merged')
+    run('load.csv', CsvLoader, CsvLoader().load, merged_df, work_dir / 'merged.csv')
+    run('extract.sqlite', SqliteExtractor, SqliteExtractor(db_path).extract, 'SELECT * FROM merged')
+    columnar_config = config.get('columnar', {})
+    columnar_loader = ColumnarLoader(work_dir / 'columnar', columnar_config.get('format', 'parquet'), columnar_config.get('partition_by'),
+                                     columnar_config.get('compression', 'zstd'), columnar_config.get('row_group_size', 100_000))
+    run('load.columnar', ColumnarLoader, columnar_loader.load, merged_df, 'merged')
+    run('extract.columnar', ColumnarExtractor, ColumnarExtractor(columnar_config.get('format', 'parquet')).extract, work_dir / 'columnar' / 'merged')
+    first_year = int(merged_df['Year'].min())
+    run('extract.columnar.years', ColumnarExtractor,
+        ColumnarExtractor(columnar_config.get('format', 'parquet'), years=(first_year, first_year + 4)).extract, work_dir / 'columnar' / 'merged')
+    check_columnar_round_trip(merged_df, columnar_loader, columnar_config.get('format', 'parquet'), work_dir / 'columnar', first_year)
+
+    measured = {result['component'] for result in results}
+    for base in (BaseExtractor, BaseTransformer, BaseLoader):
+        for subclass in sorted(all_subclasses(base), key=lambda cls: cls.__name__):
+            if subclass.__name__ not in measured:
+                print(f'Warning: {subclass.__name__} is not covered by the benchmark')
+
+    return results
+
+def check_columnar_round_trip(merged_df: pd.DataFrame, loader: ColumnarLoader, file_format: str, columnar_dir: Path, first_year: int):
+    """Read back a dataset with categorical columns, as written by the pipeline from normalized sources."""
+    normalized_df = merged_df.astype({'Country Code': 'category', 'Continent': 'category'})
+    loader.load(normalized_df, 'merged_normalized')
+    years = (first_year, first_year + 4)
+    result = ColumnarExtractor(file_format, years=years).extract(columnar_dir / 'merged_normalized')
+    expected = normalized_df[normalized_df['Year'].between(*years)]
+    sort_columns = ['Year', 'Country Code']
+    pd.testing.assert_frame_equal(result.sort_values(sort_columns).reset_index(drop=True),
+                                  expected.sort_values(sort_columns).reset_index(drop=True),
+                                  check_categorical=False)
+
+def git_version() -> str:
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def compare_with_previous(results: list[dict], scale: float, results_dir: Path):
+    """Print the change of every stage against the latest saved run at the same scale."""
+    previous_runs = sorted(results_dir.glob('*.json'))
+    previous = None
+    for path in reversed(previous_runs):
+        run = json.loads(path.read_text())
+        if run['scale'] == scale:
+            previous = run
+            break
+    if previous is None:
+        return
+
+    print(f"\nCompared with {previous['version']} ({previous['timestamp']}):")
+    previous_results = {result['stage']: result for result in previous['results']}
+    for result in results:
+        before = previous_results.get(result['stage'])
+        if before is None or not before['seconds']:
+            continue
+        time_ratio = result['seconds'] / before['seconds']
+        memory_ratio = result['peak_bytes'] / before['peak_bytes'] if before['peak_bytes'] else 1
+        flag = '  REGRESSION' if max(time_ratio, memory_ratio) > REGRESSION_THRESHOLD else ''
+        print(f"{result['stage']:<32} time x{time_ratio:>5.2f} memory x{memory_ratio:>5.2f}{flag}")
+
+def benchmark_pipeline(scale: float, results_dir: Path, seed: int):
+    config = YamlParser.load_yaml(YAML_FILE)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        work_dir = Path(tmp_dir)
+        generator = SyntheticDataGenerator(work_dir / 'data', scale, seed)
+        print(f'Pipeline benchmark: {generator.n_countries} countries (scale {scale})')
+        config = generator.write_all(config)
+        results = run_pipeline_benchmark(config, work_dir)
+
+    results_dir.mkdir(parents=True, exist_ok=True)
+    compare_with_previous(results, scale, results_dir)
+
+    timestamp = datetime.now(timezone.utc)
+    version = git_version()
+    run = {'version': version, 'timestamp': timestamp.isoformat(), 'scale': scale, 'seed': seed, 'results': results}
+    results_path = results_dir / f"{timestamp.strftime('%Y%m%dT%H%M%S')}-{version}.json"
+    results_path.write_text(json.dumps(run, indent=2))
+    print(f'\nResults saved to {results_path}')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='ETL pipeline benchmarks')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    merge_parser = subparsers.add_parser('merge', help='MergeTransformer against chained merges')
+    merge_parser.add_argument('--scale', type=float, default=100, help='Scale over the real countries x years')
+
+    reshape_parser = subparsers.add_parser('reshape', help='Emissions pivot and energy melt against DataFrame.pivot/melt')
+    reshape_parser.add_argument('--scale', type=float, default=100, help='Scale over the real number of countries')
+    reshape_parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic data')
+
+    pushdown_parser = subparsers.add_parser('pushdown', help='Transformers on lazy sources against full reads')
+    pushdown_parser.add_argument('--scale', type=float, default=2, help='Scale over the real number of countries')
+    pushdown_parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic data')
+
+    excel_parser = subparsers.add_parser('excel', help='Excel extraction engines against pd.read_excel')
+    excel_parser.add_argument('--scale', type=float, default=2, help='Scale over the real number of countries')
+    excel_parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic data')
+
+    query_parser = subparsers.add_parser('query', help='Cold and hot QueryService latency against full table reads')
+    query_parser.add_argument('--scale', type=float, default=100, help='Scale over the real countries x years')
+    query_parser.add_argument('--repeat', type=int, default=10, help='Runs of every query')
+
+    startup_parser = subparsers.add_parser('startup', help='Entry point startup time and pandas-free CSV export')
+    startup_parser.add_argument('--repeat', type=int, default=10, help='Runs of every entry point')
+    startup_parser.add_argument('--scale', type=float, default=1, help='Scale of the exported tables over the real countries x years')
+
+    download_parser = subparsers.add_parser('download', help='HttpDownloader full, conditional and resumed downloads from a local server')
+    download_parser.add_argument('--size', type=float, default=64, help='Size of the served file in MiB')
+
+    batch_parser = subparsers.add_parser('batch', help='Batch of runs sharing their sources against sequential runs')
+    batch_parser.add_argument('--scale', type=float, default=2, help='Scale over the real number of countries')
+    batch_parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic data')
+
+    pipeline_parser = subparsers.add_parser('pipeline', help='Every extractor, transformer and loader on synthetic sources')
+    pipeline_parser.add_argument('--scale', type=float, default=10, help='Scale over the real number of countries')
+    pipeline_parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic data')
+    pipeline_parser.add_argument('--results-dir', type=Path, default=RESULTS_DIR, help='Where results are saved')
+
+    args = parser.parse_args()
+    match args.benchmark:
+        case 'merge':
+            benchmark_merge(args.scale)
+        case 'reshape':
+            benchmark_reshape(args.scale, args.seed)
+        case 'pushdown':
+            benchmark_pushdown(args.scale, args.seed)
+        case 'excel':
+            benchmark_excel(args.scale, args.seed)
+        case 'query':
+            benchmark_queries(args.scale, args.repeat)
+        case 'startup':
+            benchmark_startup(args.repeat, args.scale)
+        case 'download':
+            benchmark_download(args.size)
+        case 'batch':
+            benchmark_batch(args.scale, args.seed)
+        case 'pipeline':
+            benchmark_pipeline(args.scale, args.results_dir, args.seed)
@@ -1,42 +1,29 @@
+import logging
 from pathlib import Path
-import subprocess
-import requests
 
+from src.downloaders import HttpDownloader
 from src.utils import ensure_data_directory
 from src.parsers import YamlParser
 
 YAML_FILE = Path.cwd() / 'config.yml'
 
-def create_file(url, file_path):
-    response = requests.get(url)
-    file_path.parent.mkdir(parents=True, exist_ok=True)
-
-    with open(file_path, 'wb') as file:
-        file.write(response.content)
-
-def unzip_file(file_path):
-    subprocess.run(['unzip', '-o', str(file_path), '-d', str(file_path.parent)])
-    file_path.unlink()  # Remove the zip file after extraction
-
-def rename_extracted_file(file_path):
-    # Change name of the generated file to dict key with subprocess (i know is only one file)
-    extracted_files = list((file_path.parent).glob('*'))
-    for extracted_file in extracted_files:
-        if extracted_file.is_file() and extracted_file.stem != file_path.stem:
-            extracted_file.rename(file_path.parent / f"{file_path.stem}{extracted_file.suffix}")
-
 if __name__=="__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
     yaml_parser = YamlParser()
     config = yaml_parser.load_yaml(YAML_FILE)
     
     data_dir = Path(config['data_dir']['root_dir'])
     ensure_data_directory(data_dir)
  
-    api_urls = {key: (value['url'], data_dir / value['path']) for key, value in config['download'].items()}
-    
-    for name, (url, file_path) in api_urls.items():
-        create_file(url, file_path)
-                
-        if file_path.suffix == ".zip":
-            unzip_file(file_path)
-            rename_extracted_file(file_path)
+    # Download paths in the config already start with the data directory
+    api_urls = {key: (value['url'], Path(value['path'])) for key, value in config['download'].items()}
+
+    downloader_config = config.get('downloader', {})
+    downloader = HttpDownloader(downloader_config.get('manifest', data_dir / 'download_manifest.json'),
+                                downloader_config.get('max_workers', 4),
+                                downloader_config.get('chunk_size', 1 << 20),
+                                downloader_config.get('timeout', 60))
+    # Zip archives are kept as they are, CsvExtractor reads them directly
+    downloader.download_all(api_urls)
+
@@ -1,96 +1,415 @@
-from pathlib import Path
+import argparse
+from collections.abc import Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import cache, partial
+import hashlib
+import inspect
+import json
+import logging
+import multiprocessing
+import sys
+import time
 
 import pandas as pd
 
 from src.parsers import YamlParser
-from src.extractors import CsvExtractor, ExcelExtractor
-from src.utils import generate_file_path, generate_output_path
-from src.tranformers import EnergyTransformer, PopulationTransformer, EmissionsTransformer, PibTransformer, MergeTransformer, AggregateTransformer
-from src.loaders import SqliteLoader
+from src.batch import DeferredLoader, LoaderThread, RunSpec
+from src.cache import ExtractionCache, file_fingerprint
+from src.extractors import CachedExtractor, CsvExtractor, ExcelExtractor
+from src.lazy import LazyFrame, Predicate
+from src.utils import concat_chunks, generate_file_path, generate_output_path
+from src.tranformers import BaseTransformer, CountryLookupTransformer, EnergyTransformer, PopulationTransformer, EmissionsTransformer, PibTransformer, MergeTransformer, AggregateTransformer
+from src.loaders import ColumnarLoader, SqliteLoader
+from src.normalizers import DtypeNormalizer
+from src.partitions import PartitionedAggregateTransformer
+from src.stages import StageStore
+from src.pipeline import Node, Pipeline
+from src.instrumentation import Instrumentation
 
 YAML_FILE = 'config.yml'
 
-def extract(config: dict) -> tuple[pd.DataFrame]:
-    """Extract data for all sources defined in the config.
+logger = logging.getLogger(__name__)
+
+# Sources extracted once for every run of a batch, set in the batch workers by share_sources
+SHARED_SOURCES: dict[str, pd.DataFrame] = {}
+
+EXTRACTORS = {'csv': CsvExtractor, 'zip': CsvExtractor, 'xls': ExcelExtractor, 'xlsx': ExcelExtractor}
+TRANSFORMERS = {transformer.__name__: transformer for transformer in [PopulationTransformer, CountryLookupTransformer, EnergyTransformer, EmissionsTransformer,
+                                                                      PibTransformer, MergeTransformer, AggregateTransformer,
+                                                                      PartitionedAggregateTransformer]}
+
+def create_extractor(config: dict, source: str) -> CsvExtractor | ExcelExtractor:
+    """Create the extractor for a data source defined in the config.
+
+    Args:
+        config (dict): Configuration dictionary.
+        source (str): The key for the data source.
+
+    Returns:
+        CsvExtractor | ExcelExtractor: Extractor for the source file
+    """
+    source_config = config['data_dir'][source]
+    read_config = source_config.get('read', {})
+
+    extractor = EXTRACTORS.get(source_config['extension'])
+    if extractor is CsvExtractor:
+        return CsvExtractor(read_config.get('columns'), read_config.get('dtypes'), read_config.get('chunksize'), read_config.get('member'))
+    if extractor is ExcelExtractor:
+        return ExcelExtractor(source, config.get('extract', {}).get('excel_engine', 'pandas'))
+    raise ValueError(f"Unsupported extension for data source {source}: {source_config['extension']}")
+
+def is_streamed(config: dict, source: str) -> bool:
+    return config['data_dir'][source].get('read', {}).get('stream', False)
+
+def extract_source(config: dict, source: str) -> tuple[pd.DataFrame, float]:
+    """Extract a single data source defined in the config.
+
+    Args:
+        config (dict): Configuration dictionary.
+        source (str): The key for the data source.
+
+    Returns:
+        tuple[pd.DataFrame, float]: Source DataFrame and elapsed seconds
+    """
+    start = time.perf_counter()
+    df = create_cached_extractor(config, source).extract(generate_file_path(config, source))
+    return df, time.perf_counter() - start
+
+def create_cached_extractor(config: dict, source: str) -> CsvExtractor | ExcelExtractor | CachedExtractor:
+    """Create the extractor for a data source, wrapped in a CachedExtractor when the cache is enabled.
+
+    Args:
+        config (dict): Configuration dictionary.
+        source (str): The key for the data source.
+
+    Returns:
+        CsvExtractor | ExcelExtractor | CachedExtractor: Extractor for the source file
+    """
+    extractor = create_extractor(config, source)
+    cache_config = config.get('cache', {})
+    if cache_config.get('enabled', False):
+        cache = ExtractionCache(cache_config['dir'], cache_config.get('max_size_mb', 512), cache_config.get('use_hash', False))
+        extractor = CachedExtractor(extractor, cache)
+    return extractor
+
+def normalize_source(config: dict, source: str, data: pd.DataFrame | Iterator[pd.DataFrame]) -> pd.DataFrame | Iterator[pd.DataFrame]:
+    """Cast a source to the compact schema defined in the config.
+
+    Args:
+        config (dict): Configuration dictionary.
+        source (str): The key for the data source.
+        data (pd.DataFrame | Iterator[pd.DataFrame]): Source DataFrame or its chunks
+
+    Returns:
+        pd.DataFrame | Iterator[pd.DataFrame]: Normalized DataFrame or lazily normalized chunks
+    """
+    normalize_config = config.get('normalize', {})
+    schema = normalize_config.get('schemas', {}).get(source)
+    if not normalize_config.get('enabled', False) or schema is None:
+        return data
+
+    normalizer = DtypeNormalizer(schema.get('columns'), schema.get('floats'))
+    if isinstance(data, pd.DataFrame):
+        return normalizer.normalize_and_report(data, source)
+    return (normalizer.normalize(chunk) for chunk in data)
+
+def source_fingerprint(config: dict, source: str) -> str:
+    """Fingerprint a source file together with the options it is read with.
+
+    Args:
+        config (dict): Configuration dictionary.
+        source (str): The key for the data source.
+
+    Returns:
+        str: Source fingerprint
+    """
+    use_hash = config.get('cache', {}).get('use_hash', False)
+    options = json.dumps({'read': config['data_dir'][source].get('read', {}),
+                          'normalize': config.get('normalize', {}).get('enabled', False) and config['normalize'].get('schemas', {}).get(source)},
+                         sort_keys=True)
+    return f"{file_fingerprint(generate_file_path(config, source), use_hash)}-{options}"
+
+def extract(config: dict, source: str) -> pd.DataFrame | Iterator[pd.DataFrame]:
+    """Extract a data source and cast it to its compact schema.
+
+    Sources configured with `read.stream` are returned as lazy chunk iterators.
+
+    Args:
+        config (dict): Configuration dictionary.
+        source (str): The key for the data source.
+
+    Returns:
+        pd.DataFrame | Iterator[pd.DataFrame]: Normalized DataFrame or its chunks
+    """
+    if is_streamed(config, source):
+        data = create_extractor(config, source).stream(generate_file_path(config, source))
+    else:
+        data, elapsed = extract_source(config, source)
+        logger.info("Extracted %s in %.2fs", source, elapsed)
+    return normalize_source(config, source, data)
+
+def extract_in(executor: Executor, config: dict, source: str) -> pd.DataFrame:
+    return executor.submit(extract, config, source).result()
+
+def extract_frame(config: dict, source: str) -> pd.DataFrame:
+    return concat_chunks(extract(config, source))
+
+def shared_source(sources: dict[str, pd.DataFrame], source: str) -> pd.DataFrame:
+    # Shallow copy, the consumers may add or rename columns but the data is shared
+    return sources[source].copy(deep=False)
+
+def scan_source(config: dict, source: str, columns: list[str] | None, predicates: list[Predicate]) -> pd.DataFrame:
+    """Read the columns and rows of a data source needed by a LazyFrame plan, cast to its compact schema.
+
+    With the extraction cache enabled the scanned columns and rows are cached for the plan.
+
+    Args:
+        config (dict): Configuration dictionary.
+        source (str): The key for the data source.
+        columns (list[str] | None): Columns to read, all of them for None.
+        predicates (list[Predicate]): Row filters.
+
+    Returns:
+        pd.DataFrame: Normalized DataFrame
+    """
+    start = time.perf_counter()
+    df = create_cached_extractor(config, source).scan(generate_file_path(config, source), columns, predicates)
+    logger.info("Scanned %s in %.2fs (%d rows, %d columns)", source, time.perf_counter() - start, *df.shape)
+    return normalize_source(config, source, df)
+
+def scan_in(executor: Executor, config: dict, source: str, columns: list[str] | None, predicates: list[Predicate]) -> pd.DataFrame:
+    return executor.submit(scan_source, config, source, columns, predicates).result()
+
+def lazy_source(config: dict, source: str, executor: Executor | None = None) -> LazyFrame:
+    """Unread data source, read when the transformer consuming it collects its plan.
 
     Args:
         config (dict): Configuration dictionary.
+        source (str): The key for the data source.
+        executor (Executor | None, optional): Executor the source is read in. Defaults to the calling thread.
+
+    Returns:
+        LazyFrame: Lazy frame over the source
     """
-    data_sources = config['data_sources']
-    for source in data_sources:
-        file_path = generate_file_path(config, source)
-        
-        match source:
-            case 'global_emissions':
-                csv_extractor = CsvExtractor()
-                emissions_df = csv_extractor.extract(file_path)
-            case 'population':
-                csv_extractor = CsvExtractor()
-                population_df = csv_extractor.extract(file_path)
-            case 'pib':
-                excel_extractor = ExcelExtractor(source)
-                pib_df = excel_extractor.extract(file_path)
-            case 'renewable_energy':
-                excel_extractor = ExcelExtractor(source)
-                energy_df = excel_extractor.extract(file_path)
-        
-    return emissions_df, pib_df, population_df, energy_df
-
-def transform(emissions_df: pd.DataFrame, 
-              pib_df: pd.DataFrame, 
-              population_df: pd.DataFrame, 
-              energy_df: pd.DataFrame
-              ) -> list[pd.DataFrame]:
-    """Transform input dataframes in order to obtain aggregated dataframes for countries and continents
+    if executor is None:
+        return LazyFrame(partial(scan_source, config, source))
+    return LazyFrame(partial(scan_in, executor, config, source))
+
+@cache
+def code_hash(module_name: str) -> str:
+    """Hash of the source of a module and of every src module it uses, directly or not
 
     Args:
-        emissions_df (pd.DataFrame): Global emissions data
-        pib_df (pd.DataFrame): Pib per capita per country
-        population_df (pd.DataFrame): Population stats
-        energy_df (pd.DataFrame): Produced electricity per country
+        module_name (str): Name of an imported module
 
     Returns:
-        list[pd.DataFrame]: Aggregated dataframes with mean values for countries and continents
+        str: SHA-256 of the sources
     """
-    population_tranformer = PopulationTransformer(population_df)
-    population_df = population_tranformer.transform()
+    digest = hashlib.sha256()
+    seen, pending = set(), [module_name]
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        module = sys.modules[name]
+        for value in vars(module).values():
+            used = inspect.getmodule(value)
+            if used is not None and used.__name__.startswith('src.'):
+                pending.append(used.__name__)
+    for name in sorted(seen):
+        digest.update(name.encode())
+        digest.update(inspect.getsource(sys.modules[name]).encode())
+    return digest.hexdigest()
+
+def transform_signature(transformer: type[BaseTransformer], params: dict, missing: list[int]) -> str:
+    # Helpers of the transformer (lookup, lazy plans, partitions) change its output as much as its own code
+    code = code_hash(transformer.__module__)
+    return json.dumps({'transformer': transformer.__name__, 'code': code, 'params': params, 'missing': missing}, sort_keys=True, default=str)
 
-    energy_tranformer = EnergyTransformer(energy_df)
-    energy_df = energy_tranformer.transform()
+def run_transformer(transformer: type[BaseTransformer], params: dict, missing: list[int], *inputs) -> pd.DataFrame | tuple[pd.DataFrame, ...]:
+    inputs = list(inputs)
+    for i in missing:
+        inputs.insert(i, None)
+    return transformer(*inputs, **params).transform()
 
-    emissions_transformer = EmissionsTransformer(emissions_df, population_df)
-    emissions_df = emissions_transformer.transform()
+def create_loader(config: dict) -> SqliteLoader:
+    loader_config = config.get('loader', {})
+    return SqliteLoader(generate_output_path(config, 'db'),
+                        loader_config.get('mode', 'replace'),
+                        loader_config.get('batch_size', 1000),
+                        loader_config.get('pragmas'),
+                        loader_config.get('keys'),
+                        loader_config.get('indexes'))
 
-    pib_transformer = PibTransformer(pib_df)
-    pib_df = pib_transformer.transform()
-    
-    # Merge
-    merge_tranformer = MergeTransformer(energy_df, emissions_df, pib_df, population_df)
-    merged_df = merge_tranformer.transform()
+def create_columnar_loader(config: dict) -> ColumnarLoader:
+    columnar_config = config.get('columnar', {})
+    return ColumnarLoader(generate_output_path(config, 'columnar'),
+                          columnar_config.get('format', 'parquet'),
+                          columnar_config.get('partition_by'),
+                          columnar_config.get('compression', 'zstd'),
+                          columnar_config.get('row_group_size', 100_000))
 
-    # Aggregated values
-    aggregated_transformer = AggregateTransformer(merged_df)
-    return aggregated_transformer.transform()
+def build_pipeline(config: dict,
+                   extract_executor: Executor | None = None,
+                   sources: dict[str, pd.DataFrame] | None = None,
+                   sqlite_loader: SqliteLoader | DeferredLoader | None = None) -> Pipeline:
+    """Build the pipeline DAG defined in the `pipeline` section of the config.
 
-def load(config: dict,
-         countries_df: pd.DataFrame, 
-         continents_df: pd.DataFrame):
-    db_path = generate_output_path(config, 'db')
+    Every node either extracts a source, transforms the outputs of its inputs or loads
+    its input into a table, with the SQLite loader or, for `loader: columnar`, as a
+    partitioned dataset. With `extract.lazy`, extract nodes output a LazyFrame so their
+    consumers only read the columns and rows they use. When `incremental` is enabled, transformer outputs are stored
+    and reused while neither their code, parameters nor inputs change. Transformer inputs
+    set to None (sources left out of a batch run) are passed as None.
+
+    Args:
+        config (dict): Configuration dictionary.
+        extract_executor (Executor | None, optional): Executor the sources are read in. Defaults to the pipeline threads.
+        sources (dict[str, pd.DataFrame] | None, optional): Already extracted sources, read instead of the files. Defaults to None.
+        sqlite_loader (SqliteLoader | DeferredLoader | None, optional): Loader of the sqlite tables. Defaults to the configured SqliteLoader.
+
+    Returns:
+        Pipeline: Pipeline ready to run
+    """
+    pipeline_config = config['pipeline']
+    extract_config = config.get('extract', {})
+    loaders = {'sqlite': sqlite_loader or create_loader(config), 'columnar': create_columnar_loader(config)}
+    nodes = {}
 
-    sqlite_loader = SqliteLoader(db_path)
-    sqlite_loader.load(countries_df, 'countries')
-    sqlite_loader.load(continents_df, 'continents')
+    for name, spec in pipeline_config['nodes'].items():
+        inputs = [ref for ref in spec.get('inputs', []) if ref is not None]
+        if 'extract' in spec:
+            source = spec['extract']
+            if sources is not None:
+                func = partial(shared_source, sources, source)
+            elif extract_config.get('lazy', False) and not is_streamed(config, source):
+                func = partial(lazy_source, config, source, extract_executor)
+            elif extract_executor is None or is_streamed(config, source):
+                func = partial(extract, config, source)
+            else:
+                func = partial(extract_in, extract_executor, config, source)
+            nodes[name] = Node(func, inputs, partial(source_fingerprint, config, source))
+        elif 'transform' in spec:
+            transformer = TRANSFORMERS[spec['transform']]
+            params = spec.get('params', {})
+            missing = [i for i, ref in enumerate(spec.get('inputs', [])) if ref is None]
+            nodes[name] = Node(partial(run_transformer, transformer, params, missing), inputs,
+                               partial(transform_signature, transformer, params, missing), persist=True,
+                               key_on_output=spec.get('key_on_output', False))
+        elif 'load' in spec:
+            loader = spec.get('loader', 'sqlite')
+            if loader not in loaders:
+                raise ValueError(f"Node {name} has an unknown loader: {loader}")
+            nodes[name] = Node(partial(loaders[loader].load, table_name=spec['load']), inputs)
+        else:
+            raise ValueError(f"Node {name} must define one of extract, transform or load")
+
+    incremental_config = config.get('incremental', {})
+    store = StageStore(incremental_config['dir']) if incremental_config.get('enabled', False) else None
+    return Pipeline(nodes, pipeline_config.get('max_workers'), store)
+
+def run(config: dict) -> dict[str, object]:
+    extract_config = config.get('extract', {})
+    if extract_config.get('executor') == 'process':
+        with ProcessPoolExecutor(max_workers=extract_config.get('max_workers')) as executor:
+            # Start the workers before the pipeline threads, forking while other threads hold locks can deadlock the children
+            executor.submit(int).result()
+            return build_pipeline(config, executor).run()
+    return build_pipeline(config).run()
+
+def share_sources(sources: dict[str, pd.DataFrame]):
+    global SHARED_SOURCES
+    SHARED_SOURCES = sources
+
+def run_spec(config: dict) -> list[tuple[pd.DataFrame, str]]:
+    """Run the pipeline of a batch run on the shared sources, in a batch worker.
+
+    Args:
+        config (dict): Configuration of the run.
+
+    Returns:
+        list[tuple[pd.DataFrame, str]]: Tables for the sqlite loader and their names
+    """
+    loader = DeferredLoader()
+    build_pipeline(config, sources=SHARED_SOURCES, sqlite_loader=loader).run()
+    return loader.tables
+
+def extract_all(config: dict, sources: list[str]) -> dict[str, pd.DataFrame]:
+    extract_config = config.get('extract', {})
+    executor_class = ProcessPoolExecutor if extract_config.get('executor') == 'process' else ThreadPoolExecutor
+    with executor_class(max_workers=extract_config.get('max_workers')) as executor:
+        return dict(zip(sources, executor.map(extract_frame, [config] * len(sources), sources)))
+
+def run_batch(config: dict, specs: list[RunSpec]) -> list[str]:
+    """Run the pipeline once per run specification, writing every run to the same database.
+
+    The sources used by any run are extracted once. The runs are spread over a process
+    pool whose workers get the extracted sources by fork, sharing their memory copy on
+    write instead of receiving a pickled copy (they are pickled once per worker where
+    fork is unavailable). Columnar datasets are written by the workers, the sqlite tables
+    are sent back and written one at a time by a single loader thread while the other
+    runs go on.
+
+    Args:
+        config (dict): Configuration dictionary.
+        specs (list[RunSpec]): Runs of the batch.
+
+    Returns:
+        list[str]: Names of the sqlite tables written
+    """
+    suffixes = [spec.suffix for spec in specs]
+    if len(set(suffixes)) != len(suffixes):
+        raise ValueError("Batch runs need distinct suffixes")
+
+    run_configs = [spec.apply(config) for spec in specs]
+    sources = list(dict.fromkeys(node['extract'] for run_config in run_configs
+                                 for node in run_config['pipeline']['nodes'].values() if 'extract' in node))
+    start = time.perf_counter()
+    frames = extract_all(config, sources)
+    logger.info("Extracted %d sources for %d runs in %.2fs", len(frames), len(specs), time.perf_counter() - start)
+
+    batch_config = config.get('batch', {})
+    mp_context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+    written = []
+    with ProcessPoolExecutor(batch_config.get('max_workers'), mp_context=mp_context,
+                             initializer=share_sources, initargs=(frames,)) as executor:
+        # Fork the workers before the loader thread starts, forking while another thread holds a lock can deadlock them
+        executor.submit(int).result()
+        with LoaderThread(create_loader(config), batch_config.get('max_pending', 4)) as loader:
+            futures = {executor.submit(run_spec, run_config): spec for spec, run_config in zip(specs, run_configs)}
+            for future in as_completed(futures):
+                for df, table_name in future.result():
+                    loader.put(df, table_name)
+                    written.append(table_name)
+                logger.info("Run %s done", futures[future].suffix)
+    return written
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='ETL pipeline')
+    parser.add_argument('--batch', action='store_true', help='Run every run of the batch section of the config')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
     yaml_parser = YamlParser()
     config = yaml_parser.load_yaml(YAML_FILE)
+    if args.batch:
+        main = partial(run_batch, config, [RunSpec.from_config(run_config) for run_config in config['batch']['runs']])
+    else:
+        main = partial(run, config)
 
-    # Extract
-    emissions_df, pib_df, population_df, energy_df = extract(config)
-
-    # Transform
-    countries_df, continents_df = transform(emissions_df, pib_df, population_df, energy_df)
+    instrumentation_config = config.get('instrumentation', {})
+    if not instrumentation_config.get('enabled', False):
+        main()
+    else:
+        instrumentation = Instrumentation(instrumentation_config.get('trace_memory', False),
+                                          instrumentation_config.get('profile', False))
+        with instrumentation:
+            main()
 
-    # Load
-    load(config, countries_df, continents_df)
\ No newline at end of file
+        instrumentation.write_report(instrumentation_config['report'])
+        if instrumentation.profile:
+            instrumentation.write_profile(instrumentation_config['profile_output'])
+        print(instrumentation.summary_table())
@@ -0,0 +1,172 @@
+from copy import deepcopy
+from dataclasses import dataclass
+import logging
+from pathlib import Path
+import queue
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from src.loaders import BaseLoader
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RunSpec:
+    """One run of a batch: the pipeline of the config restricted to some years and sources.
+
+    The output tables of the run get the suffix appended to their names, so every run of
+    a batch writes its own tables into the same database.
+    """
+    suffix: str
+    years: tuple[int, int] | None = None
+    sources: tuple[str, ...] | None = None
+
+    @classmethod
+    def from_config(cls, run_config: dict) -> 'RunSpec':
+        years = run_config.get('years')
+        sources = run_config.get('sources')
+        return cls(run_config['suffix'],
+                   None if years is None else (int(years[0]), int(years[1])),
+                   None if sources is None else tuple(sources))
+
+    def apply(self, config: dict) -> dict:
+        """Restrict the pipeline of a config to the run
+
+        Transformers with `start_year`/`end_year` parameters get the years of the run, a
+        run with years must keep at least one of them. Extract nodes of the sources left
+        out are dropped together with the nodes needing them; an input listed in the
+        `optional` key of a node is replaced by None instead.
+
+        Args:
+            config (dict): Configuration dictionary.
+
+        Returns:
+            dict: Configuration of the run
+        """
+        config = deepcopy(config)
+        nodes = config['pipeline']['nodes']
+
+        if self.sources is not None:
+            unknown = set(self.sources) - set(config['data_sources'])
+            if unknown:
+                raise ValueError(f"Run {self.suffix} has unknown sources: {', '.join(sorted(unknown))}")
+            dropped = {name for name, spec in nodes.items() if 'extract' in spec and spec['extract'] not in self.sources}
+            self.__drop_nodes(nodes, dropped)
+        if not any('load' in spec for spec in nodes.values()):
+            raise ValueError(f"Run {self.suffix} loads no table")
+
+        loader_config = config.setdefault('loader', {})
+        windowed = False
+        for spec in nodes.values():
+            params = spec.get('params', {})
+            if self.years is not None:
+                for param, year in zip(('start_year', 'end_year'), self.years):
+                    if param in params:
+                        params[param] = year
+                        windowed = True
+            if 'load' in spec:
+                table = spec['load']
+                spec['load'] = f'{table}{self.suffix}'
+                for option in ('keys', 'indexes'):
+                    if table in loader_config.get(option, {}):
+                        loader_config[option][spec['load']] = loader_config[option][table]
+
+        if self.years is not None and not windowed:
+            raise ValueError(f"Run {self.suffix} has years but none of its transformers has a year window")
+
+        incremental_config = config.get('incremental', {})
+        if 'dir' in incremental_config:
+            # Stored stages of a run depend on its years and sources
+            incremental_config['dir'] = str(Path(incremental_config['dir']) / f'run{self.suffix}')
+        return config
+
+    @staticmethod
+    def __drop_nodes(nodes: dict, dropped: set[str]):
+        while dropped:
+            for name in dropped:
+                del nodes[name]
+            newly_dropped = set()
+            for name, spec in nodes.items():
+                optional = spec.get('optional', [])
+                inputs = spec.get('inputs', [])
+                for i, ref in enumerate(inputs):
+                    if ref is None or ref.split('.')[0] not in dropped:
+                        continue
+                    if ref in optional:
+                        inputs[i] = None
+                    else:
+                        newly_dropped.add(name)
+            dropped = newly_dropped
+
+
+class LoaderThread:
+    """Writes DataFrames with a single loader from a dedicated thread.
+
+    Producers hand tables over with `put` and carry on, the writes run one at a time in
+    the order they were queued, so a single connection ever writes to the database. At
+    most `max_pending` tables wait in the queue, `put` blocks beyond that. The first
+    failed write is raised by `close`, the tables queued after it are dropped.
+    """
+
+    def __init__(self, loader: 'BaseLoader', max_pending: int = 4):
+        self.loader = loader
+        self.__queue = queue.Queue(max_pending)
+        self.__error: BaseException | None = None
+        self.__thread = threading.Thread(target=self.__write, name='loader', daemon=True)
+
+    def start(self) -> 'LoaderThread':
+        self.__thread.start()
+        return self
+
+    def put(self, df: 'pd.DataFrame', table_name: str):
+        """Queue a table to be written
+
+        Args:
+            df (pd.DataFrame): Data to be written
+            table_name (str): Destination table
+        """
+        self.__queue.put((df, table_name))
+
+    def close(self):
+        """Wait for the queued tables to be written
+
+        Raises:
+            BaseException: Error of the first failed write
+        """
+        self.__queue.put(None)
+        self.__thread.join()
+        if self.__error is not None:
+            raise self.__error
+
+    def __enter__(self) -> 'LoaderThread':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __write(self):
+        while (item := self.__queue.get()) is not None:
+            if self.__error is not None:
+                continue
+            df, table_name = item
+            try:
+                self.loader.load(df, table_name)
+                logger.info("Loaded %s (%d rows)", table_name, len(df))
+            except BaseException as error:
+                self.__error = error
+
+
+class DeferredLoader:
+    """Loader keeping the tables it is given, for another process to write them."""
+
+    def __init__(self):
+        self.tables: list[tuple['pd.DataFrame', str]] = []
+        self.__lock = threading.Lock()
+
+    def load(self, df: 'pd.DataFrame', table_name: str):
+        with self.__lock:
+            self.tables.append((df, table_name))
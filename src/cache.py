@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+
+def file_fingerprint(file_path: str | Path, use_hash: bool = False) -> str:
+    """Fingerprint a file by its content hash or by its mtime and size
+
+    Args:
+        file_path (str | Path): Path to the file
+        use_hash (bool, optional): Hash the file content instead of using its metadata. Defaults to False.
+
+    Returns:
+        str: File fingerprint
+    """
+    file_path = Path(file_path)
+    if use_hash:
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    stat = file_path.stat()
+    return f'{stat.st_mtime_ns}-{stat.st_size}'
+
+
+class ExtractionCache:
+    """On-disk cache of extracted DataFrames stored as uncompressed Arrow IPC (Feather) files.
+
+    Entries are keyed by the source file fingerprint and the extractor read options,
+    read back through a memory map and evicted least recently used first once the
+    cache grows over `max_size_mb`.
+    """
+
+    def __init__(self, cache_dir: str | Path, max_size_mb: float = 512, use_hash: bool = False):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.use_hash = use_hash
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def make_key(self, file_path: str | Path, extractor_name: str, options: dict) -> str:
+        """Build the cache key of an extraction
+
+        Args:
+            file_path (str | Path): Path to the source file
+            extractor_name (str): Name of the extractor class
+            options (dict): Extractor options the output depends on
+
+        Returns:
+            str: Cache key
+        """
+        payload = json.dumps({'path': str(Path(file_path).resolve()),
+                              'fingerprint': file_fingerprint(file_path, self.use_hash),
+                              'extractor': extractor_name,
+                              'options': options}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> pd.DataFrame | None:
+        """Recover a cached DataFrame
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            pd.DataFrame | None: Cached DataFrame or None on a cache miss
+        """
+        path = self.__entry_path(key)
+        if not path.exists():
+            return None
+
+        import pyarrow.feather as feather
+
+        os.utime(path)  # Mark as recently used for eviction
+        table = feather.read_table(path, memory_map=True)
+        return table.to_pandas()
+
+    def put(self, key: str, df: pd.DataFrame) -> bool:
+        """Store a DataFrame in the cache
+
+        Args:
+            key (str): Cache key
+            df (pd.DataFrame): DataFrame to be cached
+
+        Returns:
+            bool: Whether the DataFrame could be stored
+        """
+        import pyarrow as pa
+        import pyarrow.feather as feather
+
+        path = self.__entry_path(key)
+        tmp_path = path.with_suffix('.tmp')
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            feather.write_feather(table, tmp_path, compression='uncompressed')
+        except (pa.ArrowException, TypeError, ValueError):
+            # Mixed-type or non-string columns can not be stored as Arrow
+            tmp_path.unlink(missing_ok=True)
+            return False
+
+        tmp_path.replace(path)
+        self.__evict()
+        return True
+
+    def clear(self):
+        for path in self.cache_dir.glob('*.feather'):
+            path.unlink()
+
+    def __entry_path(self, key: str) -> Path:
+        return self.cache_dir / f'{key}.feather'
+
+    def __evict(self):
+        entries = sorted(self.cache_dir.glob('*.feather'), key=lambda path: path.stat().st_mtime)
+        total_size = sum(path.stat().st_size for path in entries)
+        while entries and total_size > self.max_size:
+            oldest = entries.pop(0)
+            total_size -= oldest.stat().st_size
+            oldest.unlink()
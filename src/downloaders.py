@@ -0,0 +1,146 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+from pathlib import Path
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import requests
+
+logger = logging.getLogger(__name__)
+
+
+class HttpDownloader:
+    """Downloads files concurrently over a pooled session.
+
+    Bodies are streamed to a `.part` file that is resumed with Range requests after
+    an interrupted transfer, and files whose ETag/Last-Modified did not change since
+    the previous download are skipped through conditional requests. The validators
+    are kept in a JSON manifest.
+    """
+
+    def __init__(self,
+                 manifest_path: str | Path,
+                 max_workers: int = 4,
+                 chunk_size: int = 1 << 20,
+                 timeout: float = 60,
+                 session: 'requests.Session | None' = None):
+        self.manifest_path = Path(manifest_path)
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.session = session or self.__create_session(max_workers)
+        self.manifest = self.__read_manifest()
+        self.__lock = threading.Lock()
+
+    def download_all(self, downloads: dict[str, tuple[str, Path]]) -> dict[str, bool]:
+        """Download every file concurrently
+
+        Args:
+            downloads (dict[str, tuple[str, Path]]): Url and destination path per name
+
+        Returns:
+            dict[str, bool]: Whether each file was downloaded (False when it was unchanged)
+        """
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {name: executor.submit(self.download, url, file_path) for name, (url, file_path) in downloads.items()}
+                return {name: future.result() for name, future in futures.items()}
+        finally:
+            self.__write_manifest()
+
+    def download(self, url: str, file_path: str | Path) -> bool:
+        """Download a single file, resuming a partial download if there is one
+
+        Args:
+            url (str): Url of the file
+            file_path (str | Path): Destination path
+
+        Returns:
+            bool: Whether the file was downloaded (False when it was unchanged)
+        """
+        file_path = Path(file_path)
+        part_path = file_path.with_name(f'{file_path.name}.part')
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+
+        entry = self.manifest.get(str(file_path), {})
+        if entry.get('url') != url:
+            entry = {}
+
+        headers = {}
+        offset = 0
+        partial_validator = entry.get('partial', {}).get('etag') or entry.get('partial', {}).get('last_modified')
+        if part_path.exists() and partial_validator:
+            offset = part_path.stat().st_size
+            headers['Range'] = f'bytes={offset}-'
+            headers['If-Range'] = partial_validator
+        elif file_path.exists():
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 304:
+                logger.info("%s is up to date", file_path)
+                return False
+
+            if response.status_code == 416:
+                # The partial file does not match the remote one anymore
+                part_path.unlink()
+                self.__update_manifest(file_path, {'url': url})
+                return self.download(url, file_path)
+
+            response.raise_for_status()
+            if response.status_code == 206 and self.__range_start(response) != offset:
+                # Appending a range starting elsewhere would corrupt the file, start over instead
+                logger.warning("%s answered a resume of %s at byte %d with %s", url, file_path, offset, response.headers.get('Content-Range'))
+                part_path.unlink()
+                self.__update_manifest(file_path, {'url': url})
+                return self.download(url, file_path)
+
+            validators = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+            self.__update_manifest(file_path, {**entry, 'url': url, 'partial': validators})
+
+            mode = 'ab' if response.status_code == 206 and offset else 'wb'
+            with open(part_path, mode) as file:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    file.write(chunk)
+
+        part_path.replace(file_path)
+        self.__update_manifest(file_path, {'url': url, **validators})
+        logger.info("Downloaded %s", file_path)
+        return True
+
+    @staticmethod
+    def __range_start(response: 'requests.Response') -> int | None:
+        # Content-Range: bytes <start>-<end>/<size>
+        unit, _, byte_range = response.headers.get('Content-Range', '').partition(' ')
+        start = byte_range.split('-', 1)[0]
+        return int(start) if unit == 'bytes' and start.isdigit() else None
+
+    def __update_manifest(self, file_path: Path, entry: dict):
+        with self.__lock:
+            self.manifest[str(file_path)] = entry
+
+    def __read_manifest(self) -> dict:
+        if self.manifest_path.exists():
+            return json.loads(self.manifest_path.read_text())
+        return {}
+
+    def __write_manifest(self):
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.__lock:
+            self.manifest_path.write_text(json.dumps(self.manifest, indent=2))
+
+    @staticmethod
+    def __create_session(pool_size: int) -> 'requests.Session':
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
@@ -0,0 +1,304 @@
+from collections.abc import Callable, Iterable, Iterator
+from functools import lru_cache
+from importlib.util import find_spec
+from operator import itemgetter
+from pathlib import Path
+from typing import IO
+from xml.etree import ElementTree
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+# Signature of the OLE2 container of xls files, xlsx files are zip archives
+XLS_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+# Strings read as missing values, as in the default `na_values` of pd.read_excel
+NA_STRINGS = frozenset({'', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                        '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'})
+SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+RELATIONSHIP_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+SHEET_DATA_TAG = f'{SHEET_NS}sheetData'
+ROW_TAG = f'{SHEET_NS}row'
+VALUE_TAG = f'{SHEET_NS}v'
+INLINE_STRING_TAG = f'{SHEET_NS}is'
+# Placeholder of the non-empty cells of columns that are not read
+SKIPPED = object()
+
+
+class UnsupportedSheetError(ValueError):
+    """Raised when a sheet has cells the streaming engine does not convert like pd.read_excel."""
+
+
+def calamine_available() -> bool:
+    return find_spec('python_calamine') is not None
+
+def is_xls(file_path: str | Path) -> bool:
+    # The extension is not reliable, files saved as .xls are often xlsx workbooks
+    with open(file_path, 'rb') as file:
+        return file.read(len(XLS_SIGNATURE)) == XLS_SIGNATURE
+
+def read_sheet(file_path: str | Path,
+               sheet_name: str | int = 0,
+               header: int = 0,
+               usecols: Callable[[object], bool] | None = None) -> pd.DataFrame:
+    """Read the columns of a sheet without building the workbook object model.
+
+    xls files are read column by column with xlrd and the worksheet XML of xlsx files is
+    streamed row by row, converting cell values as openpyxl does in values-only mode but
+    without creating cell objects or reading any other sheet. Only the selected columns are kept and
+    each one is turned into a NumPy array once read, with the dtypes pd.read_excel infers
+    (integral numbers as int64 unless the column has missing values, default NA strings
+    as missing values).
+
+    Args:
+        file_path (str | Path): Path to the Excel file
+        sheet_name (str | int, optional): Sheet name or position. Defaults to 0.
+        header (int, optional): Row of the column names, rows above it are skipped. Defaults to 0.
+        usecols (Callable[[object], bool] | None, optional): Whether to read a column given its name. Defaults to every column.
+
+    Returns:
+        pd.DataFrame: Sheet DataFrame
+    """
+    reader = read_xls_columns if is_xls(file_path) else read_xlsx_columns
+    names, columns = reader(file_path, sheet_name, header, usecols or (lambda name: True))
+    return pd.DataFrame(dict(zip(names, columns)), columns=names, copy=False)
+
+def read_xls_columns(file_path: str | Path, sheet_name: str | int, header: int,
+                     usecols: Callable[[object], bool]) -> tuple[list, list[np.ndarray | pd.api.extensions.ExtensionArray]]:
+    import xlrd
+
+    with xlrd.open_workbook(file_path, on_demand=True) as book:
+        sheet = book.sheet_by_name(sheet_name) if isinstance(sheet_name, str) else book.sheet_by_index(sheet_name)
+        if sheet.nrows <= header:
+            raise UnsupportedSheetError(f"Header row {header} is past the end of the sheet")
+        names = column_names(sheet.row_values(header))
+        positions = [position for position, name in enumerate(names) if usecols(name)]
+        # Trailing blank rows are dropped, as pd.read_excel does
+        empty_types = {xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK}
+        end_row = sheet.nrows
+        while end_row > header and set(sheet.row_types(end_row - 1)) <= empty_types:
+            end_row -= 1
+        if end_row == header:
+            raise UnsupportedSheetError(f"Header row {header} is past the end of the sheet")
+
+        columns = []
+        for position in positions:
+            types = sheet.col_types(position, start_rowx=header + 1, end_rowx=end_row)
+            if xlrd.XL_CELL_DATE in types:
+                raise UnsupportedSheetError(f"Date cells are not supported by the streaming engine (column {names[position]})")
+            values = sheet.col_values(position, start_rowx=header + 1, end_rowx=end_row)
+            if xlrd.XL_CELL_ERROR in types:
+                # The values of error cells are error codes, pd.read_excel reads them as missing
+                values = [None if cell_type == xlrd.XL_CELL_ERROR else value for value, cell_type in zip(values, types)]
+            # Short columns end with empty cells
+            values.extend([None] * (end_row - header - 1 - len(values)))
+            columns.append(to_array(values))
+    return [names[position] for position in positions], columns
+
+def read_xlsx_columns(file_path: str | Path, sheet_name: str | int, header: int,
+                      usecols: Callable[[object], bool]) -> tuple[list, list[np.ndarray | pd.api.extensions.ExtensionArray]]:
+    from openpyxl.reader.strings import read_string_table
+
+    with zipfile.ZipFile(file_path) as archive:
+        sheet_path = xlsx_sheet_path(archive, sheet_name)
+        strings = []
+        if 'xl/sharedStrings.xml' in archive.NameToInfo:
+            with archive.open('xl/sharedStrings.xml') as shared_strings:
+                strings = read_string_table(shared_strings)
+        date_styles = xlsx_date_styles(archive)
+        with archive.open(sheet_path) as sheet:
+            header_values = next(iter_xlsx_rows(sheet, header + 1, strings, date_styles), None)
+        if header_values is None:
+            raise UnsupportedSheetError(f"Header row {header} is past the end of the sheet")
+        names = column_names(header_values)
+        positions = [position for position, name in enumerate(names) if usecols(name)]
+
+        # Only the selected cells of every row are converted and kept, then transposed into columns.
+        # The extra first cell keeps itemgetter returning tuples when a single column is selected
+        select = itemgetter(*positions, 0)
+        min_width = max(positions, default=0) + 1
+        skipped = frozenset(range(len(names))) - frozenset(positions)
+        selected = []
+        n_rows = 0
+        with archive.open(sheet_path) as sheet:
+            for row in iter_xlsx_rows(sheet, header + 2, strings, date_styles, skipped):
+                if len(row) > len(names) and row[len(names):].count(None) < len(row) - len(names):
+                    raise UnsupportedSheetError("Rows wider than the header are not supported by the streaming engine")
+                if len(row) < min_width:
+                    row = row + [None] * (min_width - len(row))
+                selected.append(select(row))
+                if row.count(None) < len(row):
+                    n_rows = len(selected)
+
+    if n_rows == 0 and header_values.count(None) == len(header_values):
+        raise UnsupportedSheetError(f"Header row {header} is past the end of the sheet")
+    if not positions:
+        return [], []
+    # Trailing blank rows are dropped, as pd.read_excel does
+    columns = list(zip(*selected[:n_rows])) or [()] * (len(positions) + 1)
+    return [names[position] for position in positions], [to_array(list(column)) for column in columns[:len(positions)]]
+
+def xlsx_sheet_path(archive: zipfile.ZipFile, sheet_name: str | int) -> str:
+    with archive.open('xl/workbook.xml') as part:
+        workbook = ElementTree.parse(part).getroot()
+    sheets = [(sheet.get('name'), sheet.get(f'{RELATIONSHIP_NS}id')) for sheet in workbook.iter(f'{SHEET_NS}sheet')]
+    if not sheets:
+        # Strict Open XML workbooks use other namespaces
+        raise UnsupportedSheetError("No worksheets in the transitional Open XML namespace")
+    if isinstance(sheet_name, str):
+        relationship = dict(sheets).get(sheet_name)
+    else:
+        relationship = sheets[sheet_name][1] if sheet_name < len(sheets) else None
+    if relationship is None:
+        raise ValueError(f"Worksheet {sheet_name} not found")
+
+    with archive.open('xl/_rels/workbook.xml.rels') as part:
+        relationships = ElementTree.parse(part).getroot()
+    target = next(element.get('Target') for element in relationships if element.get('Id') == relationship)
+    # Targets are relative to the workbook part unless they start at the archive root
+    return target.lstrip('/') if target.startswith('/') else f'xl/{target}'
+
+def xlsx_date_styles(archive: zipfile.ZipFile) -> frozenset[int]:
+    from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+
+    if 'xl/styles.xml' not in archive.NameToInfo:
+        return frozenset()
+    with archive.open('xl/styles.xml') as part:
+        styles = ElementTree.parse(part).getroot()
+    formats = dict(BUILTIN_FORMATS)
+    formats.update((int(element.get('numFmtId')), element.get('formatCode')) for element in styles.iter(f'{SHEET_NS}numFmt'))
+    cell_styles = styles.find(f'{SHEET_NS}cellXfs')
+    if cell_styles is None:
+        return frozenset()
+    return frozenset(style_id for style_id, style in enumerate(cell_styles)
+                     if is_date_format(formats.get(int(style.get('numFmtId', 0)), 'General')))
+
+def iter_xlsx_rows(sheet: IO[bytes], min_row: int, strings: list[str], date_styles: frozenset[int],
+                   skipped: frozenset[int] = frozenset()) -> Iterator[list]:
+    """Stream the cell values of a worksheet part from a row on
+
+    Values are converted as openpyxl does in values-only mode, without building cell
+    objects, except empty strings which are read as empty cells like pd.read_excel does.
+    Missing rows are yielded as empty lists and every row ends at its last cell.
+
+    Args:
+        sheet (IO[bytes]): Worksheet XML part
+        min_row (int): First row (1-based)
+        strings (list[str]): Shared strings of the workbook
+        date_styles (frozenset[int]): Cell styles with a date number format
+        skipped (frozenset[int], optional): Columns (0-based) whose values are replaced by SKIPPED. Defaults to none.
+
+    Yields:
+        list: Cell values of a row, None for empty cells
+    """
+    next_row = min_row
+    sheet_data = None
+    for event, element in ElementTree.iterparse(sheet, events=('start', 'end')):
+        if event == 'start':
+            if element.tag == SHEET_DATA_TAG:
+                sheet_data = element
+            continue
+        if element.tag != ROW_TAG:
+            continue
+        row_number = int(element.get('r', next_row))
+        if row_number >= min_row:
+            for _ in range(next_row, row_number):
+                yield []
+            values = []
+            for cell in element:
+                reference = cell.get('r')
+                if reference:
+                    position = column_position(reference.rstrip('0123456789'))
+                    if position > len(values):
+                        values.extend([None] * (position - len(values)))
+                if len(values) in skipped:
+                    # Skipped cells are not converted, only told apart from empty ones
+                    values.append(SKIPPED if cell.findtext(VALUE_TAG) or cell.find(INLINE_STRING_TAG) is not None else None)
+                else:
+                    values.append(cell_value(cell, strings, date_styles))
+            yield values
+            next_row = row_number + 1
+        # Parsed rows are dropped so the sheet is never held in memory
+        sheet_data.clear()
+
+def cell_value(cell: ElementTree.Element, strings: list[str], date_styles: frozenset[int]) -> object:
+    data_type = cell.get('t', 'n')
+    if data_type == 'inlineStr':
+        text = cell.find(INLINE_STRING_TAG)
+        return None if text is None else ''.join(text.itertext()) or None
+    value = cell.findtext(VALUE_TAG) or None
+    if value is None:
+        return None
+    if data_type == 'n':
+        if int(cell.get('s', 0)) in date_styles:
+            raise UnsupportedSheetError(f"Date cells are not supported by the streaming engine (cell {cell.get('r')})")
+        return float(value) if '.' in value or 'E' in value or 'e' in value else int(value)
+    if data_type == 's':
+        return strings[int(value)] or None
+    if data_type == 'b':
+        return bool(int(value))
+    if data_type == 'd':
+        raise UnsupportedSheetError(f"Date cells are not supported by the streaming engine (cell {cell.get('r')})")
+    if data_type == 'e':
+        # Error cells (#DIV/0!, #N/A...) are missing values, as in pd.read_excel
+        return None
+    # Formula strings are kept as text
+    return value
+
+@lru_cache(maxsize=None)
+def column_position(letters: str) -> int:
+    position = 0
+    for letter in letters:
+        position = position * 26 + ord(letter) - ord('A') + 1
+    return position - 1
+
+def column_names(header_values: Iterable) -> list:
+    names, seen = [], {}
+    for position, value in enumerate(header_values):
+        if value is None or value == '':
+            name = f'Unnamed: {position}'
+        elif isinstance(value, float) and value.is_integer():
+            name = int(value)
+        else:
+            name = value
+        # Duplicated names get a numbered suffix
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+def to_array(values: list) -> np.ndarray | pd.api.extensions.ExtensionArray:
+    """Convert the cell values of a column with the dtype pd.read_excel would give it
+
+    Args:
+        values (list): Cell values, None for empty cells
+
+    Returns:
+        np.ndarray | pd.api.extensions.ExtensionArray: Column values
+    """
+    if not values:
+        return np.empty(0, dtype=object)
+    series = pd.Series(values)
+    if series.dtype == object or pd.api.types.is_string_dtype(series.dtype):
+        missing = series.isin(NA_STRINGS).to_numpy(dtype=bool, na_value=False) | series.isna().to_numpy()
+        if missing.all():
+            return np.full(len(series), np.nan)
+        if missing.any():
+            series = series.mask(missing, np.nan)
+        series = series.infer_objects() if series.dtype == object else series
+        if series.dtype == object or pd.api.types.is_string_dtype(series.dtype):
+            # Text cells holding numbers are parsed, as the pd.read_excel parser does
+            try:
+                series = pd.to_numeric(series)
+            except (ValueError, TypeError):
+                pass
+    if series.dtype == np.float64:
+        numbers = series.to_numpy()
+        # Numbers without a fractional part are read as integers
+        if len(numbers) and not np.isnan(numbers).any() and (numbers == np.floor(numbers)).all():
+            return numbers.astype(np.int64)
+        return numbers
+    return series.array
@@ -0,0 +1,58 @@
+from contextlib import closing
+import csv
+from pathlib import Path
+import sqlite3
+
+
+class SqliteCsvExporter:
+    """Dumps tables of a SQLite database to CSV files with the standard library only.
+
+    Meant for the small output tables and for scripts that run often: neither pandas
+    nor SQLAlchemy is imported and rows are streamed from the cursor to the file in
+    batches. The database is opened read-only. For the tables written by SqliteLoader
+    the files are the ones CsvLoader writes: a header row, rows in table order and
+    NULL as an empty field.
+    """
+
+    def __init__(self, db_path: str | Path, batch_size: int = 10_000):
+        self.db_path = Path(db_path)
+        self.batch_size = batch_size
+
+    def export(self, table: str, file_path: str | Path, columns: list[str] | None = None) -> int:
+        """Write the rows of a table to a CSV file
+
+        Args:
+            table (str): Table name
+            file_path (str | Path): Path to the CSV file
+            columns (list[str] | None, optional): Columns to write. Defaults to all of them.
+
+        Returns:
+            int: Number of rows written
+        """
+        with closing(self.__connect()) as connection:
+            table_columns = [row[1] for row in connection.execute(f'PRAGMA table_info({self.__quote(table)})')]
+            if not table_columns:
+                raise ValueError(f"Unknown table: {table}")
+            selected = table_columns if columns is None else columns
+            unknown = [column for column in selected if column not in table_columns]
+            if unknown:
+                raise ValueError(f"Table {table} has no columns: {', '.join(unknown)}")
+
+            cursor = connection.execute(f"SELECT {', '.join(self.__quote(column) for column in selected)} "
+                                        f"FROM {self.__quote(table)} ORDER BY rowid")
+            n_rows = 0
+            with open(file_path, 'w', newline='') as file:
+                writer = csv.writer(file, lineterminator='\n')
+                writer.writerow(selected)
+                while batch := cursor.fetchmany(self.batch_size):
+                    writer.writerows(batch)
+                    n_rows += len(batch)
+        return n_rows
+
+    def __connect(self) -> sqlite3.Connection:
+        # mode=ro fails on a missing database instead of creating an empty one
+        return sqlite3.connect(f'{self.db_path.resolve().as_uri()}?mode=ro', uri=True)
+
+    @staticmethod
+    def __quote(identifier: str) -> str:
+        return '"{}"'.format(identifier.replace('"', '""'))
@@ -1,20 +1,129 @@
 from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from functools import lru_cache
+import logging
 from pathlib import Path
+from typing import IO, TYPE_CHECKING
+import zipfile
 
-from sqlalchemy import create_engine
 import pandas as pd
 
+from src.cache import ExtractionCache
+from src.excel import UnsupportedSheetError, calamine_available, read_sheet
+from src.instrumentation import instrument_class
+from src.lazy import Predicate, apply_predicates, project
+from src.utils import concat_chunks
+
+# SQLAlchemy and pyarrow are only imported by the extractors that use them
+if TYPE_CHECKING:
+    from sqlalchemy import Engine, TextClause
+    import pyarrow.dataset as ds
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def sqlite_engine(db_path: str) -> 'Engine':
+    """Engine of a SQLite database, shared within the process so its connection pool is reused
+
+    Args:
+        db_path (str): Resolved path to the database file
+
+    Returns:
+        Engine: SQLAlchemy engine
+    """
+    from sqlalchemy import create_engine
+
+    return create_engine(f'sqlite:///{db_path}')
+
 
 class BaseExtractor(ABC):
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        instrument_class(cls, 'extract')
+
     @abstractmethod
     def extract(self, data):
         pass
 
+class CachedExtractor(BaseExtractor):
+    """Wraps a file extractor and reuses its output through an ExtractionCache.
+
+    Scans are cached with their columns and predicates in the key, so each LazyFrame plan
+    reads the file once and its entry only holds the columns and rows the plan uses.
+    """
+
+    def __init__(self, extractor: BaseExtractor, cache: ExtractionCache):
+        self.extractor = extractor
+        self.cache = cache
+
+    def extract(self, file_path: str | Path) -> pd.DataFrame:
+        """Extract data from filepath, skipping the wrapped extractor on a cache hit
+
+        Args:
+            file_path (str | Path): Path to the source file
+
+        Returns:
+            pd.DataFrame: File DataFrame
+        """
+        key = self.cache.make_key(file_path, type(self.extractor).__name__, self.extractor.cache_options)
+        df = self.cache.get(key)
+        if df is None:
+            df = self.extractor.extract(file_path)
+            self.cache.put(key, df)
+        return df
+
+    def scan(self, file_path: str | Path, columns: list[str] | None = None, predicates: list[Predicate] | None = None) -> pd.DataFrame:
+        """Extract only some columns and the rows matching every predicate, skipping the wrapped extractor on a cache hit
+
+        Args:
+            file_path (str | Path): Path to the source file
+            columns (list[str] | None, optional): Columns to read. Defaults to all of them.
+            predicates (list[Predicate] | None, optional): Row filters. Defaults to None.
+
+        Returns:
+            pd.DataFrame: Matching rows with the selected columns
+        """
+        predicates = predicates or []
+        plan = {'columns': columns, 'predicates': [[predicate.column, predicate.op, predicate.value] for predicate in predicates]}
+        key = self.cache.make_key(file_path, type(self.extractor).__name__, {**self.extractor.cache_options, 'scan': plan})
+        df = self.cache.get(key)
+        if df is None:
+            df = self.extractor.scan(file_path, columns, predicates)
+            self.cache.put(key, df)
+        return df
+
 class ExcelExtractor(BaseExtractor):
-    """Extracts data from Excel files."""
+    """Extracts data from Excel files.
+
+    The `pandas` engine reads sheets with pd.read_excel. The `streaming` engine reads
+    only the needed sheet and columns straight into NumPy arrays (see `src.excel`) and
+    falls back to pd.read_excel for sheets it does not support. `calamine` reads with the
+    Rust calamine engine of pd.read_excel, which needs the optional python-calamine
+    package. `auto` picks calamine when it is installed and streaming otherwise.
+    """
 
-    def __init__(self, name: str):
+    ENGINES = ('auto', 'streaming', 'calamine', 'pandas')
+
+    def __init__(self, name: str, engine: str = 'pandas'):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown Excel engine: {engine}")
         self.name = name
+        if engine == 'auto':
+            engine = 'calamine' if calamine_available() else 'streaming'
+        self.engine = engine
+        if name == 'pib':
+            self.read_options = {'sheet_name': 'Full data'}
+        elif name == 'renewable_energy':
+            self.read_options = {'sheet_name': 'Data', 'header': 3}
+        else:
+            self.read_options = {}
+
+    @property
+    def cache_options(self) -> dict:
+        """Options the extracted DataFrame depends on, part of its extraction cache key"""
+        return {**self.read_options, 'engine': self.engine}
 
     def extract(self, file_path: str | Path) -> pd.DataFrame:
         """Extract data from filepath
@@ -25,42 +134,213 @@ class ExcelExtractor(BaseExtractor):
         Returns:
             pd.DataFrame: File DataFrame
         """
-        if self.name == 'pib':
-            return pd.read_excel(file_path, sheet_name='Full data')
-        elif self.name == 'renewable_energy':
-            return pd.read_excel(file_path, sheet_name='Data', header=3)
-        else:
-            return pd.read_excel(file_path)
+        return self.__read(file_path)
+
+    def scan(self, file_path: str | Path, columns: list[str] | None = None, predicates: list[Predicate] | None = None) -> pd.DataFrame:
+        """Extract only some columns and the rows matching every predicate
+
+        Only the needed columns are parsed into the DataFrame and rows are filtered before
+        anything else is built from them.
+
+        Args:
+            file_path (str | Path): Path to Excel file
+            columns (list[str] | None, optional): Columns to return, all of them for None. Defaults to None.
+            predicates (list[Predicate] | None, optional): Row filters. Defaults to None.
+
+        Returns:
+            pd.DataFrame: Matching rows of the file
+        """
+        predicates = predicates or []
+        usecols = None
+        if columns is not None:
+            wanted = set(columns) | {predicate.column for predicate in predicates}
+            usecols = lambda column: column in wanted
+        df = self.__read(file_path, usecols)
+        return project(apply_predicates(df, predicates), columns)
+
+    def __read(self, file_path: str | Path, usecols: Callable[[object], bool] | None = None) -> pd.DataFrame:
+        read_options = dict(self.read_options)
+        if self.engine == 'streaming':
+            try:
+                return read_sheet(file_path, read_options.get('sheet_name', 0), read_options.get('header', 0), usecols)
+            except UnsupportedSheetError as e:
+                logger.info("Reading %s with pandas: %s", file_path, e)
+        elif self.engine == 'calamine':
+            read_options['engine'] = 'calamine'
+        if usecols is not None:
+            read_options['usecols'] = usecols
+        return pd.read_excel(file_path, **read_options)
 
 class CsvExtractor(BaseExtractor):
-    """Extracts data from CSV files."""
+    """Extracts data from CSV files, read directly from inside zip archives when needed."""
+
+    def __init__(self,
+                 columns: list[str] | None = None,
+                 dtypes: dict | None = None,
+                 chunksize: int | None = None,
+                 member: str | None = None):
+        self.chunksize = chunksize
+        self.member = member
+        self.read_options = {}
+        if columns:
+            self.read_options['usecols'] = columns
+        if dtypes:
+            self.read_options['dtype'] = dtypes
+
+    @property
+    def cache_options(self) -> dict:
+        """Options the extracted DataFrame depends on, part of its extraction cache key"""
+        return {**self.read_options, 'chunksize': self.chunksize, 'member': self.member}
 
     def extract(self, file_path: str | Path) -> pd.DataFrame:
         """Extract data from a filepath
 
         Args:
-            file_path (str | Path): Path to csv file
+            file_path (str | Path): Path to csv file or to a zip archive containing it
 
         Returns:
             pd.DataFrame: File DataFrame
         """
-        return pd.read_csv(file_path)
+        if self.chunksize:
+            return concat_chunks(self.stream(file_path))
+        with self.__open(file_path) as file:
+            return pd.read_csv(file, **self.read_options)
+
+    def scan(self, file_path: str | Path, columns: list[str] | None = None, predicates: list[Predicate] | None = None) -> pd.DataFrame:
+        """Extract only some columns and the rows matching every predicate
+
+        Other columns are skipped by the parser and, with predicates, the file is read in
+        chunks filtered as they are parsed, so discarded rows are never accumulated.
+
+        Args:
+            file_path (str | Path): Path to csv file or to a zip archive containing it
+            columns (list[str] | None, optional): Columns to return, all of them for None. Defaults to None.
+            predicates (list[Predicate] | None, optional): Row filters. Defaults to None.
+
+        Returns:
+            pd.DataFrame: Matching rows of the file
+        """
+        predicates = predicates or []
+        read_options = dict(self.read_options)
+        if columns is not None:
+            wanted = set(columns) | {predicate.column for predicate in predicates}
+            usecols = read_options.get('usecols')
+            read_options['usecols'] = lambda column: column in wanted and (usecols is None or column in usecols)
+
+        with self.__open(file_path) as file:
+            if not predicates:
+                return pd.read_csv(file, **read_options)
+            with pd.read_csv(file, chunksize=self.chunksize or 100_000, **read_options) as reader:
+                df = concat_chunks(apply_predicates(chunk, predicates) for chunk in reader)
+        return project(df, columns)
+
+    def stream(self, file_path: str | Path) -> Iterator[pd.DataFrame]:
+        """Lazily extract data from a filepath in chunks
+
+        Args:
+            file_path (str | Path): Path to csv file or to a zip archive containing it
+
+        Yields:
+            Iterator[pd.DataFrame]: File chunks of at most `chunksize` rows
+        """
+        with self.__open(file_path) as file, pd.read_csv(file, chunksize=self.chunksize or 100_000, **self.read_options) as reader:
+            yield from reader
+
+    @contextmanager
+    def __open(self, file_path: str | Path) -> Iterator[str | Path | IO[bytes]]:
+        if Path(file_path).suffix != '.zip':
+            yield file_path
+            return
+
+        # Decompress the member on the fly instead of extracting it to disk
+        with zipfile.ZipFile(file_path) as archive:
+            member = self.member or self.__find_csv_member(archive)
+            with archive.open(member) as file:
+                yield file
+
+    @staticmethod
+    def __find_csv_member(archive: zipfile.ZipFile) -> str:
+        members = [name for name in archive.namelist() if name.lower().endswith('.csv')]
+        if len(members) != 1:
+            raise ValueError(f"Expected a single CSV file in {archive.filename}, found {members}")
+        return members[0]
     
 
 class SqliteExtractor(BaseExtractor):
     """Extracts data from SQLite database files."""
 
     def __init__(self, db_path: str | Path):
-        self.engine = create_engine(f'sqlite:///{db_path}')
+        self.engine = sqlite_engine(str(Path(db_path).resolve()))
 
-    def extract(self, query: str) -> pd.DataFrame:
+    def extract(self, query: 'str | TextClause', params: dict | None = None) -> pd.DataFrame:
         """Extract from table
 
         Args:
-            query (str): Query to be exectuted
+            query (str | TextClause): Query to be exectuted
+            params (dict | None, optional): Bound parameters of the query. Defaults to None.
 
         Returns:
             pd.DataFrame: Recovered Data
         """
         with self.engine.connect() as connection:
-            return pd.read_sql_query(query, connection)
\ No newline at end of file
+            return pd.read_sql_query(query, connection, params=params)
+
+
+class ColumnarExtractor(BaseExtractor):
+    """Extracts the datasets written by ColumnarLoader.
+
+    The year range is a filter on the `Year` partitions, so only the directories of the
+    selected years are read, and the columns come back in their original order and dtypes.
+    """
+
+    def __init__(self,
+                 file_format: str = 'parquet',
+                 columns: list[str] | None = None,
+                 years: tuple[int | None, int | None] | None = None):
+        self.file_format = file_format
+        self.columns = columns
+        self.years = years
+
+    def extract(self, dataset_dir: str | Path) -> pd.DataFrame:
+        """Extract data from a dataset directory
+
+        Args:
+            dataset_dir (str | Path): Path to the dataset of a table
+
+        Returns:
+            pd.DataFrame: Dataset DataFrame
+        """
+        import pyarrow.dataset as ds
+
+        dataset = ds.dataset(dataset_dir, format='ipc' if self.file_format == 'feather' else self.file_format, partitioning='hive')
+        table = dataset.to_table(columns=self.columns, filter=self.__year_filter())
+        df = table.to_pandas()
+
+        # Partition columns are stored in the paths, restore their place and dtype from the pandas metadata.
+        # The numpy_type of a categorical column is the dtype of its codes, categoricals are restored by to_pandas
+        metadata = dataset.schema.pandas_metadata or {}
+        columns = {column['name']: column for column in metadata.get('columns', [])}
+        order = [column for column in columns if column in df.columns]
+        partition_columns = dataset.partitioning.schema.names if dataset.partitioning is not None else []
+        partition_dtypes = {column: columns[column]['numpy_type'] for column in partition_columns
+                            if column in columns and column in df.columns
+                            and columns[column]['pandas_type'] != 'categorical'
+                            and columns[column]['numpy_type'].startswith(('int', 'uint'))
+                            and str(df[column].dtype) != columns[column]['numpy_type']}
+        return df[order + [column for column in df.columns if column not in order]].astype(partition_dtypes)
+
+    def __year_filter(self) -> 'ds.Expression | None':
+        import pyarrow.dataset as ds
+
+        if self.years is None:
+            return None
+        first_year, last_year = self.years
+        conditions = []
+        if first_year is not None:
+            conditions.append(ds.field('Year') >= first_year)
+        if last_year is not None:
+            conditions.append(ds.field('Year') <= last_year)
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
@@ -0,0 +1,278 @@
+from contextlib import contextmanager, nullcontext
+import cProfile
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+import functools
+import inspect
+import io
+import json
+from pathlib import Path
+import pstats
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+
+_active = None
+
+
+@dataclass
+class StepMetrics:
+    name: str
+    kind: str
+    depth: int
+    parent: int | None  # Position of the enclosing step in the records, None for a root step
+    thread: str
+    wall_seconds: float
+    cpu_seconds: float
+    max_rss_bytes: int
+    memory_delta_bytes: int | None
+    memory_peak_bytes: int | None
+    input_rows: int | None
+    input_columns: int | None
+    output_rows: int | None
+    output_columns: int | None
+
+
+class Instrumentation:
+    """Records metrics of every pipeline stage and sub-step while it is active.
+
+    Stages are the `extract`/`transform`/`load` methods of the extractor, transformer
+    and loader subclasses and sub-steps their private `__` methods; both are wrapped
+    when the subclass is defined and record nothing unless an Instrumentation is active.
+    Any other block can be measured with `stage()`.
+
+    Traced memory is process wide, so with parallel stages the memory of one stage
+    includes the allocations of the others running at the same time, and cProfile
+    only captures the thread that entered the Instrumentation. Stages running in
+    worker processes are not recorded.
+    """
+
+    def __init__(self, trace_memory: bool = False, profile: bool = False):
+        self.trace_memory = trace_memory
+        self.profile = profile
+        self.records: list[StepMetrics] = []
+        self.profile_stats = None
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+        self.__profiler = None
+
+    def __enter__(self) -> 'Instrumentation':
+        global _active
+        self.__started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if self.__started_tracing:
+            tracemalloc.start()
+        if self.profile:
+            self.__profiler = cProfile.Profile()
+            self.__profiler.enable()
+        self.started_at = datetime.now(timezone.utc)
+        _active = self
+        return self
+
+    def __exit__(self, *exc_info):
+        global _active
+        _active = None
+        if self.__profiler is not None:
+            self.__profiler.disable()
+            self.profile_stats = pstats.Stats(self.__profiler)
+        if self.__started_tracing:
+            tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name: str, data=None):
+        """Measure a block of code as a stage
+
+        The context yields a function to register the output of the stage for its row and column counts.
+
+        Args:
+            name (str): Stage name
+            data (optional): Input data of the stage, used for its row and column counts
+        """
+        frame = self.__start(name, 'stage', data)
+        outputs = []
+        try:
+            yield outputs.append
+        finally:
+            self.__finish(frame, outputs[-1] if outputs else None)
+
+    def call(self, name: str, kind: str, func, instance, args: tuple, kwargs: dict):
+        data = args[0] if args and kind == 'stage' else getattr(instance, 'df', None)
+        frame = self.__start(name, kind, data)
+        output = None
+        try:
+            output = func(instance, *args, **kwargs)
+            return output
+        finally:
+            self.__finish(frame, output if output is not None else getattr(instance, 'df', None))
+
+    def report(self) -> dict:
+        """Build the structured run report
+
+        Returns:
+            dict: Run metadata and the metrics of every stage and sub-step
+        """
+        report = {'started_at': self.started_at.isoformat(),
+                  'trace_memory': self.trace_memory,
+                  'records': [asdict(record) for record in self.records]}
+        if self.profile_stats is not None:
+            report['profile'] = self.__profile_summary()
+        return report
+
+    def write_report(self, file_path: str | Path):
+        file_path = Path(file_path)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_text(json.dumps(self.report(), indent=2))
+
+    def write_profile(self, file_path: str | Path):
+        if self.profile_stats is not None:
+            self.profile_stats.dump_stats(str(file_path))
+
+    def summary_table(self) -> str:
+        """Format the recorded metrics as a table, every step under the step it ran in
+
+        Root steps are listed in the order they started, each followed by its own sub-steps,
+        so the steps of stages running in parallel threads are not interleaved.
+
+        Returns:
+            str: Summary table
+        """
+        header = f"{'Stage':<48} {'Wall (s)':>9} {'CPU (s)':>9} {'Mem (MiB)':>10} {'Rows in':>9} {'Rows out':>9}"
+        lines = [header, '-' * len(header)]
+        children = {}
+        for i, record in enumerate(self.records):
+            children.setdefault(record.parent, []).append(i)
+        ordered = []
+        to_visit = children.get(None, [])[::-1]
+        while to_visit:
+            i = to_visit.pop()
+            ordered.append(self.records[i])
+            to_visit.extend(children.get(i, [])[::-1])
+
+        for record in ordered:
+            name = f"{'  ' * record.depth}{record.name}"
+            memory = '' if record.memory_peak_bytes is None else f'{record.memory_peak_bytes / 2**20:.1f}'
+            rows_in = '' if record.input_rows is None else record.input_rows
+            rows_out = '' if record.output_rows is None else record.output_rows
+            lines.append(f'{name:<48} {record.wall_seconds:>9.3f} {record.cpu_seconds:>9.3f} {memory:>10} {rows_in:>9} {rows_out:>9}')
+        max_rss = max((record.max_rss_bytes for record in self.records), default=0)
+        lines.append(f'Peak RSS: {max_rss / 2**20:.1f} MiB')
+        return '\n'.join(lines)
+
+    def __start(self, name: str, kind: str, data) -> dict:
+        stack = self.__stack()
+        frame = {'name': name, 'kind': kind, 'depth': len(stack), 'parent': stack[-1]['index'] if stack else None,
+                 'input': self.__shape(data), 'peak': 0,
+                 'wall': time.perf_counter(), 'cpu': time.thread_time(), 'index': None}
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            frame['memory'] = current
+
+        # Reserve the position so records keep the execution order of nested steps
+        with self.__lock:
+            frame['index'] = len(self.records)
+            self.records.append(None)
+        stack.append(frame)
+        return frame
+
+    def __finish(self, frame: dict, output):
+        wall = time.perf_counter() - frame['wall']
+        cpu = time.thread_time() - frame['cpu']
+        stack = self.__stack()
+        stack.pop()
+
+        memory_delta = memory_peak = None
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            memory_peak = max(frame['peak'], peak) - frame['memory']
+            memory_delta = current - frame['memory']
+            if stack:
+                stack[-1]['peak'] = max(stack[-1]['peak'], frame['peak'], peak)
+
+        input_rows, input_columns = frame['input']
+        output_rows, output_columns = self.__shape(output)
+        record = StepMetrics(frame['name'], frame['kind'], frame['depth'], frame['parent'], threading.current_thread().name,
+                             wall, cpu, self.__max_rss(), memory_delta, memory_peak,
+                             input_rows, input_columns, output_rows, output_columns)
+        with self.__lock:
+            self.records[frame['index']] = record
+
+    def __stack(self) -> list[dict]:
+        if not hasattr(self.__local, 'stack'):
+            self.__local.stack = []
+        return self.__local.stack
+
+    def __profile_summary(self, limit: int = 25) -> list[dict]:
+        stats = pstats.Stats(self.__profiler, stream=io.StringIO())
+        entries = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+        return [{'function': f'{filename}:{line}({function})', 'calls': calls, 'total_seconds': total, 'cumulative_seconds': cumulative}
+                for (filename, line, function), (_, calls, total, cumulative, _) in entries]
+
+    @staticmethod
+    def __shape(data) -> tuple[int | None, int | None]:
+        if isinstance(data, tuple) and data:
+            data = data[0]
+        shape = getattr(data, 'shape', None)
+        if shape is None or len(shape) != 2:
+            return None, None
+        return int(shape[0]), int(shape[1])
+
+    @staticmethod
+    def __max_rss() -> int:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def active_instrumentation() -> Instrumentation | None:
+    return _active
+
+def stage(name: str, data=None):
+    """Measure a block of code as a stage when an Instrumentation is active
+
+    Args:
+        name (str): Stage name
+        data (optional): Input data of the stage, used for its row and column counts
+    """
+    return nullcontext(lambda output: None) if _active is None else _active.stage(name, data)
+
+def instrumented(name: str, kind: str):
+    """Decorate a method so its calls are recorded by the active Instrumentation
+
+    Args:
+        name (str): Recorded name
+        kind (str): 'stage' or 'step'
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            instrumentation = _active
+            if instrumentation is None:
+                return func(self, *args, **kwargs)
+            return instrumentation.call(name, kind, func, self, args, kwargs)
+        wrapper.__instrumented__ = True
+        return wrapper
+    return decorator
+
+def instrument_class(cls: type, stage_method: str):
+    """Wrap the stage method and the private sub-step methods of a class
+
+    Args:
+        cls (type): Extractor, transformer or loader class
+        stage_method (str): Name of the stage method ('extract', 'transform' or 'load')
+    """
+    private_prefix = f'_{cls.__name__}__'
+    for attribute, value in list(vars(cls).items()):
+        if not inspect.isfunction(value) or getattr(value, '__instrumented__', False):
+            continue
+        # Generators and context managers only run when consumed, their call time is meaningless
+        if inspect.isgeneratorfunction(value) or hasattr(value, '__wrapped__'):
+            continue
+        if attribute == stage_method:
+            setattr(cls, attribute, instrumented(f'{cls.__name__}.{attribute}', 'stage')(value))
+        elif attribute.startswith(private_prefix) and not attribute.endswith('__'):
+            step = attribute[len(private_prefix):]
+            setattr(cls, attribute, instrumented(f'{cls.__name__}.{step}', 'step')(value))
@@ -0,0 +1,200 @@
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, replace
+from functools import partial
+import operator
+
+import numpy as np
+import pandas as pd
+
+OPERATORS = {'==': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+
+
+@dataclass(frozen=True)
+class Predicate:
+    """Row filter comparing a column with a value, `in` tests membership in a list of values."""
+    column: str
+    op: str
+    value: object
+
+    def __post_init__(self):
+        if self.op not in OPERATORS and self.op != 'in':
+            raise ValueError(f"Unknown filter operator: {self.op}")
+
+    def mask(self, df: pd.DataFrame) -> np.ndarray:
+        """Rows of a DataFrame matching the predicate, missing values never match
+
+        Args:
+            df (pd.DataFrame): DataFrame with the column of the predicate
+
+        Returns:
+            np.ndarray: Boolean mask
+        """
+        column = df[self.column]
+        result = column.isin(self.value) if self.op == 'in' else OPERATORS[self.op](column, self.value)
+        return result.to_numpy(dtype=bool, na_value=False)
+
+    def __str__(self) -> str:
+        return f'{self.column} {self.op} {self.value!r}'
+
+
+def apply_predicates(df: pd.DataFrame, predicates: Iterable[Predicate]) -> pd.DataFrame:
+    """Keep the rows matching every predicate
+
+    Args:
+        df (pd.DataFrame): DataFrame to be filtered
+        predicates (Iterable[Predicate]): Row filters
+
+    Returns:
+        pd.DataFrame: Matching rows with their original index labels
+    """
+    masks = [predicate.mask(df) for predicate in predicates]
+    return df[np.logical_and.reduce(masks)] if masks else df
+
+def project(df: pd.DataFrame, columns: list[str] | None) -> pd.DataFrame:
+    """Keep the given columns that the DataFrame has, in the order of the DataFrame
+
+    Args:
+        df (pd.DataFrame): DataFrame to be projected
+        columns (list[str] | None): Columns to keep, None keeps them all
+
+    Returns:
+        pd.DataFrame: Projected DataFrame
+    """
+    if columns is None:
+        return df
+    wanted = set(columns)
+    return df[[column for column in df.columns if column in wanted]]
+
+def read_frame(df: pd.DataFrame, columns: list[str] | None, predicates: list[Predicate]) -> pd.DataFrame:
+    """Source of a LazyFrame over an in-memory DataFrame."""
+    return project(apply_predicates(df, predicates), columns)
+
+
+@dataclass(frozen=True)
+class Select:
+    columns: tuple[str, ...]
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df[list(self.columns)]
+
+@dataclass(frozen=True)
+class Filter:
+    predicate: Predicate
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        return apply_predicates(df, [self.predicate])
+
+@dataclass(frozen=True)
+class Rename:
+    mapping: dict[str, str]
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df.rename(columns=self.mapping)
+
+@dataclass(frozen=True)
+class Plan:
+    """Optimized plan: what the source reads and the operations left to run on its output."""
+    columns: list[str] | None
+    predicates: list[Predicate]
+    operations: list
+
+
+class LazyFrame:
+    """Records DataFrame operations and runs them on demand, reading only the data they need.
+
+    The source is a function `(columns, predicates) -> DataFrame` returning the rows
+    matching every predicate with the given columns (all of them for None). Before
+    running, the filters are pushed down into the source (through the renames before
+    them), and the columns used by the whole plan become the source projection. Extractors with a `scan` method apply both while reading the file,
+    so rows and columns that would be discarded are never materialized.
+
+    Every operation returns a new LazyFrame, the original plan is left untouched.
+    """
+
+    def __init__(self, source: Callable[[list[str] | None, list[Predicate]], pd.DataFrame], operations: tuple = ()):
+        self.source = source
+        self.operations = operations
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'LazyFrame':
+        return cls(partial(read_frame, df))
+
+    def select(self, columns: list[str]) -> 'LazyFrame':
+        return self.__then(Select(tuple(columns)))
+
+    def filter(self, column: str, op: str, value) -> 'LazyFrame':
+        return self.__then(Filter(Predicate(column, op, value)))
+
+    def rename(self, columns: dict[str, str]) -> 'LazyFrame':
+        return self.__then(Rename(dict(columns)))
+
+    def optimize(self) -> Plan:
+        """Push the filters and the column projection of the plan down to its source
+
+        Returns:
+            Plan: Source columns and predicates, and the remaining operations
+        """
+        predicates, operations = self.__push_filters()
+        columns, operations = self.__prune_columns(operations)
+        return Plan(columns, predicates, operations)
+
+    def explain(self) -> str:
+        plan = self.optimize()
+        lines = [f"Scan(columns={plan.columns}, filters=[{', '.join(str(predicate) for predicate in plan.predicates)}])"]
+        lines.extend(f'  {type(operation).__name__}' + (f'({operation.columns})' if isinstance(operation, Select) else '')
+                     for operation in plan.operations)
+        return '\n'.join(lines)
+
+    def collect(self) -> pd.DataFrame:
+        """Run the optimized plan
+
+        Returns:
+            pd.DataFrame: Result of the operations
+        """
+        plan = self.optimize()
+        df = self.source(plan.columns, plan.predicates)
+        for operation in plan.operations:
+            df = operation.apply(df)
+        return df
+
+    def __then(self, operation) -> 'LazyFrame':
+        return LazyFrame(self.source, self.operations + (operation,))
+
+    def __push_filters(self) -> tuple[list[Predicate], list]:
+        # Selects and renames keep the rows, so every filter can run at the source
+        source_names = {}
+        predicates, operations = [], []
+        for operation in self.operations:
+            if isinstance(operation, Filter):
+                column = operation.predicate.column
+                predicates.append(replace(operation.predicate, column=source_names.get(column, column)))
+                continue
+            if isinstance(operation, Rename):
+                renamed = {new: source_names.get(old, old) for old, new in operation.mapping.items()}
+                source_names = {**{name: source for name, source in source_names.items() if name not in operation.mapping}, **renamed}
+            operations.append(operation)
+        return predicates, operations
+
+    @staticmethod
+    def __prune_columns(operations: list) -> tuple[list[str] | None, list]:
+        # Walk the plan backwards from its output, None means every column.
+        # Selects only keep the columns used after them, as the source no longer reads the others
+        needed = None
+        pruned = []
+        for operation in reversed(operations):
+            match operation:
+                case Select(columns=columns):
+                    if needed is not None:
+                        operation = Select(tuple(column for column in columns if column in needed))
+                    needed = list(operation.columns)
+                case Rename(mapping=mapping) if needed is not None:
+                    inverse = {new: old for old, new in mapping.items()}
+                    needed = [inverse.get(column, column) for column in needed]
+                case Filter(predicate=predicate) if needed is not None:
+                    needed = needed + [predicate.column]
+            pruned.append(operation)
+        return None if needed is None else list(dict.fromkeys(needed)), pruned[::-1]
+
+
+def as_lazy(data: pd.DataFrame | LazyFrame) -> LazyFrame:
+    return data if isinstance(data, LazyFrame) else LazyFrame.from_frame(data)
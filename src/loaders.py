@@ -1,22 +1,260 @@
 from abc import ABC, abstractmethod
 from pathlib import Path
+import shutil
+import tempfile
+from typing import TYPE_CHECKING
 
-from sqlalchemy import create_engine
 import pandas as pd
 
+from src.instrumentation import instrument_class
+
+if TYPE_CHECKING:
+    import pyarrow.dataset as ds
+
 
 class BaseLoader(ABC):
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        instrument_class(cls, 'load')
+
     @abstractmethod
     def load(self):
         pass
 
 class SqliteLoader(BaseLoader):
-    def __init__(self, db_path: str | Path):
+    """Loads DataFrames into SQLite tables with batched inserts inside a single transaction.
+
+    Modes:
+        replace: drop and rebuild the table.
+        append: insert rows, ignoring the ones whose key already exists.
+        upsert: insert new rows, update only the rows whose values changed and delete the
+            rows whose key is missing from the DataFrame, so the table ends up as with
+            replace. Tables without keys are replaced.
+
+    In every mode the keys of the DataFrame must be unique and the table ends up with the
+    columns of the DataFrame: columns missing from it are dropped from the table.
+
+    Every load bumps the generation of the table in `GENERATIONS_TABLE` within the same
+    transaction, so readers caching query results know when a table has changed.
+    """
+
+    MODES = ('replace', 'append', 'upsert')
+    GENERATIONS_TABLE = 'etl_generations'
+
+    def __init__(self,
+                 db_path: str | Path,
+                 mode: str = 'replace',
+                 batch_size: int = 1000,
+                 pragmas: dict | None = None,
+                 keys: dict[str, list[str]] | None = None,
+                 indexes: dict[str, list[list[str]]] | None = None):
+        from sqlalchemy import create_engine, event
+
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown load mode: {mode}")
+
         self.engine = create_engine(f'sqlite:///{db_path}')
+        self.mode = mode
+        self.batch_size = batch_size
+        self.pragmas = pragmas or {}
+        self.keys = keys or {}
+        self.indexes = indexes or {}
+        event.listen(self.engine, 'connect', self.__set_pragmas)
 
     def load(self, df: pd.DataFrame, table_name: str):
-        df.to_sql(table_name, self.engine, index=False, if_exists='replace')
+        """Write a DataFrame into a table
+
+        Args:
+            df (pd.DataFrame): Data to be written
+            table_name (str): Destination table
+
+        Raises:
+            ValueError: The DataFrame has duplicate keys
+        """
+        keys = self.keys.get(table_name, [])
+        columns = df.columns.tolist()
+        # Checked up front so every mode fails the same way, before anything is written
+        if keys and df.duplicated(keys).any():
+            raise ValueError(f"Duplicate keys {keys} in the rows loaded into {table_name}")
+
+        with self.engine.begin() as connection:
+            if self.mode == 'replace' or (self.mode == 'upsert' and not keys):
+                connection.exec_driver_sql(f'DROP TABLE IF EXISTS {self.__quote(table_name)}')
+            self.__create_table(connection, df, table_name, keys)
+
+            insert_sql = self.__insert_statement(table_name, columns, keys)
+            for batch in self.__batches(df):
+                connection.exec_driver_sql(insert_sql, batch)
+            if self.mode == 'upsert' and keys:
+                self.__delete_missing_keys(connection, df, table_name, keys)
+            self.__bump_generation(connection, table_name)
+
+    def __set_pragmas(self, dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in self.pragmas.items():
+            cursor.execute(f'PRAGMA {pragma}={value}')
+        cursor.close()
+
+    def __create_table(self, connection, df: pd.DataFrame, table_name: str, keys: list[str]):
+        column_definitions = ', '.join(f'{self.__quote(column)} {self.__sql_type(dtype)}' for column, dtype in df.dtypes.items())
+        connection.exec_driver_sql(f'CREATE TABLE IF NOT EXISTS {self.__quote(table_name)} ({column_definitions})')
+
+        # Tables created by a previous run may lack newly added columns or keep removed ones
+        existing_columns = {row[1] for row in connection.exec_driver_sql(f'PRAGMA table_info({self.__quote(table_name)})')}
+        if existing_columns - set(df.columns):
+            self.__rebuild_table(connection, table_name, column_definitions, [column for column in df.columns if column in existing_columns])
+            existing_columns = set(df.columns)
+        for column, dtype in df.dtypes.items():
+            if column not in existing_columns:
+                connection.exec_driver_sql(f'ALTER TABLE {self.__quote(table_name)} ADD COLUMN {self.__quote(column)} {self.__sql_type(dtype)}')
+
+        # A unique index on the keys also serves as the conflict target of append/upsert
+        if keys:
+            key_columns = ', '.join(self.__quote(key) for key in keys)
+            connection.exec_driver_sql(f'CREATE UNIQUE INDEX IF NOT EXISTS {self.__quote(f"ux_{table_name}_keys")} ON {self.__quote(table_name)} ({key_columns})')
+
+        # Secondary indexes backing the filters of the query layer
+        for index_columns in self.indexes.get(table_name, []):
+            index_name = f"ix_{table_name}_{'_'.join(index_columns)}".replace(' ', '_')
+            quoted_columns = ', '.join(self.__quote(column) for column in index_columns if column in df.columns)
+            if quoted_columns:
+                connection.exec_driver_sql(f'CREATE INDEX IF NOT EXISTS {self.__quote(index_name)} ON {self.__quote(table_name)} ({quoted_columns})')
+
+    def __rebuild_table(self, connection, table_name: str, column_definitions: str, kept_columns: list[str]):
+        # SQLite cannot drop indexed columns, the rows are copied to a table with the new columns instead
+        rebuilt = self.__quote(f'{table_name}_rebuilt')
+        connection.exec_driver_sql(f'DROP TABLE IF EXISTS {rebuilt}')
+        connection.exec_driver_sql(f'CREATE TABLE {rebuilt} ({column_definitions})')
+        if kept_columns:
+            quoted_columns = ', '.join(self.__quote(column) for column in kept_columns)
+            connection.exec_driver_sql(f'INSERT INTO {rebuilt} ({quoted_columns}) SELECT {quoted_columns} FROM {self.__quote(table_name)}')
+        connection.exec_driver_sql(f'DROP TABLE {self.__quote(table_name)}')
+        connection.exec_driver_sql(f'ALTER TABLE {rebuilt} RENAME TO {self.__quote(table_name)}')
+
+    def __delete_missing_keys(self, connection, df: pd.DataFrame, table_name: str, keys: list[str]):
+        # The incoming keys go to a temporary table, the rows without a match are deleted in one statement
+        incoming = self.__quote(f'incoming_{table_name}_keys')
+        key_columns = ', '.join(self.__quote(key) for key in keys)
+        connection.exec_driver_sql(f'DROP TABLE IF EXISTS temp.{incoming}')
+        connection.exec_driver_sql(f'CREATE TEMP TABLE {incoming} ({key_columns})')
+        insert_sql = f"INSERT INTO temp.{incoming} ({key_columns}) VALUES ({', '.join('?' for _ in keys)})"
+        for batch in self.__batches(df[keys]):
+            connection.exec_driver_sql(insert_sql, batch)
+        matches = ' AND '.join(f'incoming.{self.__quote(key)} IS {self.__quote(table_name)}.{self.__quote(key)}' for key in keys)
+        connection.exec_driver_sql(f'DELETE FROM {self.__quote(table_name)} '
+                                   f'WHERE NOT EXISTS (SELECT 1 FROM temp.{incoming} AS incoming WHERE {matches})')
+        connection.exec_driver_sql(f'DROP TABLE temp.{incoming}')
+
+    def __bump_generation(self, connection, table_name: str):
+        generations = self.__quote(self.GENERATIONS_TABLE)
+        connection.exec_driver_sql(f'CREATE TABLE IF NOT EXISTS {generations} (table_name TEXT PRIMARY KEY, generation INTEGER NOT NULL)')
+        connection.exec_driver_sql(f'INSERT INTO {generations} (table_name, generation) VALUES (?, 1) '
+                                   'ON CONFLICT (table_name) DO UPDATE SET generation = generation + 1', (table_name,))
+
+    def __insert_statement(self, table_name: str, columns: list[str], keys: list[str]) -> str:
+        quoted_columns = ', '.join(self.__quote(column) for column in columns)
+        placeholders = ', '.join('?' for _ in columns)
+        sql = f'INSERT INTO {self.__quote(table_name)} ({quoted_columns}) VALUES ({placeholders})'
+        if not keys or self.mode == 'replace':
+            return sql
+
+        conflict_target = ', '.join(self.__quote(key) for key in keys)
+        value_columns = [column for column in columns if column not in keys]
+        if self.mode == 'append' or not value_columns:
+            return f'{sql} ON CONFLICT ({conflict_target}) DO NOTHING'
+
+        assignments = ', '.join(f'{self.__quote(column)} = excluded.{self.__quote(column)}' for column in value_columns)
+        changed = ' OR '.join(f'{self.__quote(column)} IS NOT excluded.{self.__quote(column)}' for column in value_columns)
+        return f'{sql} ON CONFLICT ({conflict_target}) DO UPDATE SET {assignments} WHERE {changed}'
+
+    def __batches(self, df: pd.DataFrame):
+        for start in range(0, len(df), self.batch_size):
+            batch = df.iloc[start:start + self.batch_size].astype(object)
+            yield list(batch.where(batch.notna(), None).itertuples(index=False, name=None))
+
+    @staticmethod
+    def __sql_type(dtype) -> str:
+        if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+            return 'INTEGER'
+        if pd.api.types.is_float_dtype(dtype):
+            return 'REAL'
+        return 'TEXT'
+
+    @staticmethod
+    def __quote(identifier: str) -> str:
+        return '"{}"'.format(identifier.replace('"', '""'))
 
 class CsvLoader(BaseLoader):
     def load(self, df: pd.DataFrame, file_path: str | Path):
-        df.to_csv(file_path, index=False)
\ No newline at end of file
+        df.to_csv(file_path, index=False)
+
+class ColumnarLoader(BaseLoader):
+    """Writes DataFrames as Parquet or Feather datasets partitioned by column values.
+
+    Every table is a directory with one hive-style subdirectory per partition value
+    (e.g. `Year=1990/`), so year-range reads only open the matching partitions. Parquet
+    files are compressed and keep row-group statistics for the remaining filters.
+    A table is written to a temporary directory and swapped in once complete, so
+    readers never see a partially written dataset.
+    """
+
+    FORMATS = ('parquet', 'feather')
+
+    def __init__(self,
+                 root_dir: str | Path,
+                 file_format: str = 'parquet',
+                 partition_by: list[str] | None = None,
+                 compression: str | None = 'zstd',
+                 row_group_size: int = 100_000):
+        if file_format not in self.FORMATS:
+            raise ValueError(f"Unknown columnar format: {file_format}")
+
+        self.root_dir = Path(root_dir)
+        self.file_format = file_format
+        self.partition_by = ['Year'] if partition_by is None else partition_by
+        self.compression = compression
+        self.row_group_size = row_group_size
+
+    def load(self, df: pd.DataFrame, table_name: str):
+        """Write a DataFrame as a partitioned dataset, replacing the previous one
+
+        Args:
+            df (pd.DataFrame): Data to be written
+            table_name (str): Dataset directory under the root directory
+        """
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        partition_columns = [column for column in self.partition_by if column in df.columns]
+        partitioning = ds.partitioning(pa.schema([table.schema.field(column) for column in partition_columns]), flavor='hive') if partition_columns else None
+
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        staging_dir = Path(tempfile.mkdtemp(prefix=f'.{table_name}-', dir=self.root_dir))
+        try:
+            file_format = self.__file_format()
+            ds.write_dataset(table, staging_dir / 'data', format=file_format, partitioning=partitioning,
+                             file_options=self.__write_options(file_format), max_rows_per_group=self.row_group_size,
+                             max_rows_per_file=0, basename_template=f'part-{{i}}.{self.file_format}')
+            self.__swap(staging_dir / 'data', self.root_dir / table_name)
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    def __file_format(self) -> 'ds.FileFormat':
+        import pyarrow.dataset as ds
+
+        return ds.ParquetFileFormat() if self.file_format == 'parquet' else ds.IpcFileFormat()
+
+    def __write_options(self, file_format: 'ds.FileFormat') -> 'ds.FileWriteOptions':
+        if self.file_format == 'parquet':
+            return file_format.make_write_options(compression=self.compression, write_statistics=True)
+        return file_format.make_write_options(compression=self.compression)
+
+    @staticmethod
+    def __swap(new_dir: Path, table_dir: Path):
+        old_dir = table_dir.with_name(f'.{table_dir.name}-old')
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if table_dir.exists():
+            table_dir.rename(old_dir)
+        new_dir.rename(table_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
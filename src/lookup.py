@@ -0,0 +1,119 @@
+from collections.abc import Callable
+from functools import lru_cache
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+IGNORED_WORDS = {'the', 'of'}
+WORD_REPLACEMENTS = {'saint': 'st', 'rep': 'republic', 'dem': 'democratic'}
+
+
+@lru_cache(maxsize=None)
+def normalize_name(name: str) -> str:
+    """Normalize a country name so spelling variants share the same key.
+
+    Accents, case, punctuation, word order ("Korea, Rep." and "Republic of Korea") and
+    common abbreviations ("St.", "Rep.", "Dem.") are ignored. Results are memoized for the process.
+
+    Args:
+        name (str): Country name
+
+    Returns:
+        str: Lookup key
+    """
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode().casefold()
+    name = name.replace('&', ' and ')
+    words = re.sub(r'[^\w\s]', ' ', name).split()
+    return ' '.join(sorted(WORD_REPLACEMENTS.get(word, word) for word in words if word not in IGNORED_WORDS))
+
+
+class CountryLookup:
+    """Maps country names and codes to dense country ids.
+
+    The lookup is stored as a DataFrame with one row per normalized name (`Name Key`),
+    its `Country Code` and the canonical `Country Name` of that code, so it can be
+    passed between pipeline nodes and persisted like any other stage output.
+    Mappings work on the distinct values of a column (the categories of a categorical
+    column) and are broadcast to the rows with an array lookup on their codes.
+    """
+
+    columns = ['Name Key', 'Country Code', 'Country Name']
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.keys = pd.Index(df['Name Key'])
+        code_ids, codes = pd.factorize(df['Country Code'])
+        self.key_ids = code_ids
+        self.codes = pd.Index(codes)
+        first_rows = np.unique(code_ids, return_index=True)[1]
+        self.names = pd.Index(df['Country Name'].to_numpy()[first_rows])
+
+    @classmethod
+    def build(cls, sources: list[pd.DataFrame], aliases: dict[str, str] | None = None) -> 'CountryLookup':
+        """Build the lookup from frames with `Country Code` and `Country Name` columns
+
+        Earlier sources take precedence: the canonical name of a code is its name in the
+        first source that has it, and a name keeps the first code it was seen with.
+
+        Args:
+            sources (list[pd.DataFrame]): Frames with country codes and names
+            aliases (dict[str, str] | None, optional): Extra names mapped to their code. Defaults to None.
+
+        Returns:
+            CountryLookup: Country lookup
+        """
+        pairs = pd.concat([df[['Country Code', 'Country Name']].astype(object) for df in sources], ignore_index=True).dropna()
+        if aliases:
+            canonical = pairs.drop_duplicates('Country Code').set_index('Country Code')['Country Name']
+            alias_pairs = pd.DataFrame({'Country Code': list(aliases.values()), 'Country Name': list(aliases.keys())})
+            pairs = pd.concat([pairs, alias_pairs[alias_pairs['Country Code'].isin(canonical.index)]], ignore_index=True)
+
+        canonical = pairs.drop_duplicates('Country Code').set_index('Country Code')['Country Name']
+        pairs['Name Key'] = [normalize_name(name) for name in pairs['Country Name']]
+        pairs = pairs.drop_duplicates('Name Key')
+        pairs['Country Name'] = canonical.loc[pairs['Country Code']].to_numpy()
+        return cls(pairs[cls.columns].reset_index(drop=True))
+
+    def code_ids(self, codes: pd.Series) -> np.ndarray:
+        """Country id of every code, -1 for unknown or missing codes
+
+        Args:
+            codes (pd.Series): Country codes
+
+        Returns:
+            np.ndarray: Country ids
+        """
+        return self.__map_distinct(codes, self.codes.get_indexer)
+
+    def name_ids(self, names: pd.Series) -> np.ndarray:
+        """Country id of every name, -1 for unknown or missing names
+
+        Args:
+            names (pd.Series): Country names in any of the known spellings
+
+        Returns:
+            np.ndarray: Country ids
+        """
+        def lookup(distinct_names: pd.Index) -> np.ndarray:
+            positions = self.keys.get_indexer([normalize_name(str(name)) for name in distinct_names])
+            return np.where(positions >= 0, self.key_ids[positions], -1)
+
+        return self.__map_distinct(names, lookup)
+
+    def country_codes(self, ids: np.ndarray) -> pd.api.extensions.ExtensionArray:
+        return self.codes.array.take(ids, allow_fill=True)
+
+    def country_names(self, ids: np.ndarray) -> pd.api.extensions.ExtensionArray:
+        return self.names.array.take(ids, allow_fill=True)
+
+    @staticmethod
+    def __map_distinct(values: pd.Series, func: Callable[[pd.Index], np.ndarray]) -> np.ndarray:
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes, distinct = values.cat.codes.to_numpy(), values.cat.categories
+        else:
+            codes, distinct = pd.factorize(values)
+        ids = np.append(func(pd.Index(distinct)), -1) if len(distinct) else np.array([-1])
+        # Missing values have code -1, which picks the trailing -1
+        return ids[codes].astype(np.int64)
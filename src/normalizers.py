@@ -0,0 +1,61 @@
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class DtypeNormalizer:
+    """Casts DataFrames to a compact schema.
+
+    Columns are cast to the dtypes given in `columns` (e.g. category for strings,
+    int16 for years) and, when `floats` is set, every other float64 column is
+    downcast to that dtype.
+    """
+
+    def __init__(self, columns: dict[str, str] | None = None, floats: str | None = None):
+        self.columns = columns or {}
+        self.floats = floats
+
+    def normalize(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Cast a DataFrame to the schema
+
+        Args:
+            df (pd.DataFrame): DataFrame with default dtypes
+
+        Returns:
+            pd.DataFrame: DataFrame with compact dtypes
+        """
+        dtypes = {column: dtype for column, dtype in self.columns.items() if column in df.columns}
+        if self.floats:
+            dtypes.update({column: self.floats for column, dtype in df.dtypes.items()
+                           if column not in dtypes and dtype == 'float64'})
+        return df.astype(dtypes) if dtypes else df
+
+    @staticmethod
+    def memory_usage(df: pd.DataFrame) -> int:
+        """Memory used by a DataFrame, including the contents of object columns
+
+        Args:
+            df (pd.DataFrame): DataFrame to be measured
+
+        Returns:
+            int: Bytes used
+        """
+        return int(df.memory_usage(deep=True).sum())
+
+    def normalize_and_report(self, df: pd.DataFrame, name: str) -> pd.DataFrame:
+        """Cast a DataFrame to the schema logging its memory usage before and after
+
+        Args:
+            df (pd.DataFrame): DataFrame with default dtypes
+            name (str): Name used in the report
+
+        Returns:
+            pd.DataFrame: DataFrame with compact dtypes
+        """
+        before = self.memory_usage(df)
+        df = self.normalize(df)
+        after = self.memory_usage(df)
+        logger.info("Normalized %s: %.2f MiB -> %.2f MiB", name, before / 2**20, after / 2**20)
+        return df
@@ -1,23 +1,106 @@
+import copy
+import hashlib
+import json
+import os
 from pathlib import Path
-
-import yaml
+import tempfile
+import threading
 
 
 class YamlParser:
+    """Loads YAML files, keeping every parsed file until it changes.
 
-    @staticmethod
-    def load_yaml(file_path: str | Path) -> dict:
+    Parsed files are cached in memory for the process and stored as JSON in the user cache
+    directory (`$XDG_CACHE_HOME/etl`, `~/.cache/etl` by default), so scripts started often
+    (cron jobs, health checks) skip importing and running the YAML parser while the file
+    is unchanged. Like bytecode caches, entries are checked against the modification time
+    and size of the file. Content JSON cannot represent as parsed (non-string keys, dates)
+    is only cached in memory. Every call returns its own copy, callers can modify it freely.
+    """
+
+    __cache: dict[Path, tuple[tuple[int, int], dict]] = {}
+    __lock = threading.Lock()
+
+    @classmethod
+    def load_yaml(cls, file_path: str | Path, use_cache: bool = True) -> dict:
         """Load YML file
 
         Args:
             file_path (str | Path): Path to the YAML file
+            use_cache (bool, optional): Whether to reuse a previous parse of the unchanged file. Defaults to True.
 
         Returns:
             dict: YAML content
         """
+        if not use_cache:
+            return cls.__parse(file_path)
+
+        file_path = Path(file_path).resolve()
+        stat = file_path.stat()
+        version = [stat.st_mtime_ns, stat.st_size]
+        with cls.__lock:
+            cached = cls.__cache.get(file_path)
+        if cached is None or cached[0] != version:
+            content = cls.__read_cache(file_path, version)
+            if content is None:
+                content = cls.__parse(file_path)
+                cls.__write_cache(file_path, version, content)
+            cached = (version, content)
+            with cls.__lock:
+                cls.__cache[file_path] = cached
+        return copy.deepcopy(cached[1])
+
+    @classmethod
+    def clear_cache(cls):
+        with cls.__lock:
+            cls.__cache.clear()
+
+    @staticmethod
+    def __parse(file_path: str | Path) -> dict:
+        import yaml
+
         with open(file_path, 'r') as file:
             return yaml.safe_load(file)
-    
+
+    @staticmethod
+    def __cache_path(file_path: Path) -> Path:
+        cache_home = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+        digest = hashlib.sha256(str(file_path).encode()).hexdigest()[:16]
+        return Path(cache_home) / 'etl' / f'{file_path.name}-{digest}.json'
+
+    @classmethod
+    def __read_cache(cls, file_path: Path, version: list[int]) -> dict | None:
+        try:
+            with open(cls.__cache_path(file_path), 'r') as file:
+                cached = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(cached, dict) or cached.get('version') != version:
+            return None
+        return cached.get('content')
+
+    @classmethod
+    def __write_cache(cls, file_path: Path, version: list[int], content: dict):
+        try:
+            serialized = json.dumps({'version': version, 'content': content})
+        except (TypeError, ValueError):
+            return
+        if json.loads(serialized)['content'] != content:
+            return
+
+        cache_path = cls.__cache_path(file_path)
+        tmp_path = None
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=cache_path.parent)
+            with os.fdopen(fd, 'w') as file:
+                file.write(serialized)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            # Read-only directories only lose the cache
+            if tmp_path is not None:
+                Path(tmp_path).unlink(missing_ok=True)
+
 def parse_api_urls(config: dict) -> dict:
     """Prepare urls for downloading
 
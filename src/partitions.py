@@ -0,0 +1,197 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from src.tranformers import BaseTransformer, MergeTransformer
+
+
+def hash_partitions(keys: pd.Series, n_partitions: int) -> np.ndarray:
+    """Assign every row to a partition by the hash of its key.
+
+    Equal values hash equally whatever the dtype (categorical or not), and
+    missing keys always fall in the first partition, so rows that can join
+    end up in the same partition across frames.
+
+    Args:
+        keys (pd.Series): Partition key of every row
+        n_partitions (int): Number of partitions
+
+    Returns:
+        np.ndarray: Partition of every row
+    """
+    # Hash each distinct key once
+    codes, uniques = pd.factorize(keys)
+    hashed = (pd.util.hash_array(np.asarray(uniques, dtype=object)) % np.uint64(n_partitions)).astype(np.int64)
+    return np.where(codes >= 0, hashed[codes], 0)
+
+
+class Partitioner:
+    """Splits a DataFrame into hash partitions without copying them all at once."""
+
+    def __init__(self, df: pd.DataFrame, key: str, n_partitions: int):
+        self.df = df
+        partitions = hash_partitions(df[key], n_partitions)
+        self.order = np.argsort(partitions, kind='stable')
+        self.bounds = np.concatenate([[0], np.cumsum(np.bincount(partitions, minlength=n_partitions))])
+
+    def partition(self, i: int) -> pd.DataFrame:
+        """Rows of a partition, in their original order
+
+        Args:
+            i (int): Partition number
+
+        Returns:
+            pd.DataFrame: Partition rows
+        """
+        return self.df.take(self.order[self.bounds[i]:self.bounds[i + 1]]).reset_index(drop=True)
+
+    def spill(self, file_path: Path) -> list[tuple[Path, int, int]]:
+        """Write the partitions one after another to a single Feather file
+
+        Args:
+            file_path (Path): Feather file
+
+        Returns:
+            list[tuple[Path, int, int]]: File, first row and number of rows of every partition
+        """
+        import pyarrow as pa
+
+        schema = pa.Schema.from_pandas(self.df, preserve_index=False)
+        with pa.ipc.new_file(file_path, schema) as writer:
+            for i in range(len(self.bounds) - 1):
+                writer.write_table(pa.Table.from_pandas(self.partition(i), schema=schema, preserve_index=False))
+        return [(file_path, int(start), int(stop - start)) for start, stop in zip(self.bounds[:-1], self.bounds[1:])]
+
+
+def read_partition(partition: pd.DataFrame | tuple[Path, int, int] | None) -> pd.DataFrame | None:
+    if partition is None or isinstance(partition, pd.DataFrame):
+        return partition
+    import pyarrow.feather as feather
+
+    file_path, start, length = partition
+    # Memory mapped, only the rows of the partition are materialized
+    return feather.read_table(file_path, memory_map=True).slice(start, length).to_pandas()
+
+
+def aggregate_partition(frames: list[pd.DataFrame | tuple[Path, int, int] | None],
+                        not_values_columns: list[str],
+                        lookup_df: pd.DataFrame | None = None) -> tuple[list[tuple[pd.DataFrame, pd.DataFrame]], pd.Series]:
+    """Merge the energy, emissions, pib and population rows of a partition and aggregate them.
+
+    Runs in the worker processes, so partitions spilled to disk are passed as the slice of their file.
+
+    Args:
+        frames (list[pd.DataFrame | tuple[Path, int, int] | None]): Energy, emissions, pib and population partitions or their file slices, None for missing sources
+        not_values_columns (list[str]): Merged columns that are not averaged
+        lookup_df (pd.DataFrame | None, optional): Country lookup. Defaults to None.
+
+    Returns:
+        tuple[list[tuple[pd.DataFrame, pd.DataFrame]], pd.Series]: Sums and non-missing counts by country and by continent, and the dtypes of the averaged columns
+    """
+    merged_df = MergeTransformer(*[read_partition(frame) for frame in frames], lookup_df).transform()
+    values_columns = [col for col in merged_df.columns if col not in not_values_columns]
+    values_df = merged_df[values_columns].astype('float64')
+
+    partials = []
+    for keys in (PartitionedAggregateTransformer.country_keys, ['Continent']):
+        grouped = values_df.groupby([merged_df[key] for key in keys], observed=True, sort=False)
+        partials.append((grouped.sum(), grouped.count()))
+    return partials, merged_df[values_columns].dtypes
+
+
+class PartitionedAggregateTransformer(BaseTransformer):
+    """Merges and aggregates countries and continents partition by partition.
+
+    Every input is hash partitioned by `Country Code`, so all the rows of a country
+    fall in the same partition and each partition is merged independently. Means are
+    combined from the sums and non-missing counts of every partition, giving the same
+    outputs as MergeTransformer followed by AggregateTransformer while only one merged
+    partition per worker is in memory at a time.
+
+    With `spill_dir`, every input is written once to a Feather file with its partitions
+    one after another, and the worker processes read their slice memory-mapped instead
+    of having the partitions pickled to them.
+    """
+
+    country_keys = ['Country Code', 'Country Name', 'Continent']
+    not_values_columns = ['Country Code', 'Country Name', 'Continent', 'Year', 'Population']
+
+    def __init__(self,
+                 energy_df: pd.DataFrame | None,
+                 emissions_df: pd.DataFrame | None,
+                 pib_df: pd.DataFrame | None,
+                 population_df: pd.DataFrame,
+                 lookup_df: pd.DataFrame | None = None,
+                 n_partitions: int = 8,
+                 max_workers: int = 1,
+                 spill_dir: str | Path | None = None):
+        self.frames = [energy_df, emissions_df, pib_df, population_df]
+        self.lookup_df = lookup_df
+        self.n_partitions = n_partitions
+        self.max_workers = max_workers
+        self.spill_dir = spill_dir
+
+    def transform(self) -> tuple[pd.DataFrame, pd.DataFrame]:
+        self.__partition()
+        self.__aggregate_partitions()
+        self.__combine_partials()
+        return self.countries_df, self.continents_df
+
+    def __partition(self):
+        # Missing sources stay None in every partition, MergeTransformer leaves them out
+        self.partitioners = [None if df is None else Partitioner(df, 'Country Code', self.n_partitions) for df in self.frames]
+
+    def __aggregate_partitions(self):
+        if self.max_workers <= 1 and self.spill_dir is None:
+            self.partials = [aggregate_partition(self.__partitions(i), self.not_values_columns, self.lookup_df)
+                             for i in range(self.n_partitions)]
+            return
+
+        spill_path = None
+        if self.spill_dir is not None:
+            Path(self.spill_dir).mkdir(parents=True, exist_ok=True)
+            spill_path = Path(tempfile.mkdtemp(dir=self.spill_dir))
+            spilled = [None if partitioner is None else partitioner.spill(spill_path / f'{j}.feather')
+                       for j, partitioner in enumerate(self.partitioners)]
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                # Only build the partitions of the workers that are busy, not all of them upfront
+                self.partials = []
+                pending = deque()
+                for i in range(self.n_partitions):
+                    if len(pending) >= self.max_workers:
+                        self.partials.append(pending.popleft().result())
+                    if spill_path is None:
+                        frames = self.__partitions(i)
+                    else:
+                        frames = [None if partitions is None else partitions[i] for partitions in spilled]
+                    pending.append(executor.submit(aggregate_partition, frames, self.not_values_columns, self.lookup_df))
+                self.partials.extend(future.result() for future in pending)
+        finally:
+            if spill_path is not None:
+                shutil.rmtree(spill_path, ignore_errors=True)
+
+    def __partitions(self, i: int) -> list[pd.DataFrame | None]:
+        return [None if partitioner is None else partitioner.partition(i) for partitioner in self.partitioners]
+
+    def __combine_partials(self):
+        dtypes = self.partials[0][1]
+        self.countries_df = self.__combine([partials[0] for partials, _ in self.partials], dtypes)
+        self.continents_df = self.__combine([partials[1] for partials, _ in self.partials], dtypes)
+
+    @staticmethod
+    def __combine(partials: list[tuple[pd.DataFrame, pd.DataFrame]], dtypes: pd.Series) -> pd.DataFrame:
+        sums = pd.concat([sums for sums, _ in partials])
+        counts = pd.concat([counts for _, counts in partials])
+        levels = list(range(sums.index.nlevels))
+        sums = sums.groupby(level=levels, observed=True).sum()
+        counts = counts.groupby(level=levels, observed=True).sum()
+        # Mean of the non-missing values, NaN where a group has none
+        means = (sums / counts.where(counts > 0)).astype({col: dtype if dtype == 'float32' else 'float64' for col, dtype in dtypes.items()})
+        return means.reset_index()
@@ -0,0 +1,185 @@
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from graphlib import CycleError, TopologicalSorter
+import hashlib
+import json
+import logging
+
+from src.instrumentation import stage
+from src.stages import StageStore, output_hash
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Node:
+    """A pipeline step computing its output from the outputs of its input nodes.
+
+    Inputs name upstream nodes, `name.i` selects the i-th element of a tuple output.
+    A node with a `signature` has a key hashing the signature and the keys of its inputs;
+    when `persist` is set its output is saved to the StageStore and reused while the key
+    does not change. Nodes without a signature (e.g. loaders) always run.
+
+    With `key_on_output`, consumers are keyed on a hash of the node output instead of
+    its key: when an input of the node changes, the node runs again but its consumers
+    are only recomputed if its output changed.
+    """
+    func: Callable[..., object]
+    inputs: list[str] = field(default_factory=list)
+    signature: Callable[[], str] | None = None
+    persist: bool = False
+    key_on_output: bool = False
+
+
+class Pipeline:
+    """Runs a DAG of nodes on a thread pool.
+
+    Independent nodes run concurrently as soon as their inputs are ready, outputs are
+    passed to the consumers as they are and dropped once the last consumer has run.
+    """
+
+    def __init__(self, nodes: dict[str, Node], max_workers: int | None = None, store: StageStore | None = None):
+        self.nodes = nodes
+        self.max_workers = max_workers
+        self.store = store
+        self.__graph = {name: {self.__split(ref)[0] for ref in node.inputs} for name, node in nodes.items()}
+        self.__validate()
+        self.__keys = {}
+        self.__output_keys = {}
+
+    def run(self, targets: list[str] | None = None) -> dict[str, object]:
+        """Run the nodes needed to compute the targets
+
+        Args:
+            targets (list[str] | None, optional): Nodes whose output is returned. Defaults to the nodes without consumers.
+
+        Returns:
+            dict[str, object]: Output of every target
+        """
+        if targets is None:
+            consumed = set().union(*self.__graph.values())
+            targets = [name for name in self.nodes if name not in consumed]
+
+        stored = {}
+        needed = self.__needed_nodes(targets, stored)
+        graph = {name: set() if name in stored else self.__graph[name] for name in needed}
+        pending_consumers = {name: sum(name in inputs for inputs in graph.values()) for name in needed}
+
+        outputs = {}
+        sorter = TopologicalSorter(graph)
+        sorter.prepare()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures: dict[Future, str] = {}
+            try:
+                while sorter.is_active():
+                    for name in sorter.get_ready():
+                        if name in stored:
+                            futures[executor.submit(self.__load_stored, name, stored[name])] = name
+                        else:
+                            args = [self.__resolve(outputs, ref) for ref in self.nodes[name].inputs]
+                            futures[executor.submit(self.__run_node, name, args)] = name
+
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = futures.pop(future)
+                        outputs[name] = future.result()
+                        sorter.done(name)
+                        for upstream in graph[name]:
+                            pending_consumers[upstream] -= 1
+                            if pending_consumers[upstream] == 0 and upstream not in targets:
+                                del outputs[upstream]
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        return {name: outputs[name] for name in targets}
+
+    def key(self, name: str) -> str | None:
+        """Compute the key of a node
+
+        Args:
+            name (str): Node name
+
+        Returns:
+            str | None: Node key or None if the node or any of its upstream nodes has no signature
+        """
+        if name not in self.__keys:
+            node = self.nodes[name]
+            input_keys = [self.__input_key(self.__split(ref)[0]) for ref in node.inputs]
+            if node.signature is None or None in input_keys:
+                self.__keys[name] = None
+            else:
+                payload = json.dumps({'signature': node.signature(), 'inputs': input_keys, 'refs': node.inputs}, sort_keys=True)
+                self.__keys[name] = hashlib.sha256(payload.encode()).hexdigest()
+        return self.__keys[name]
+
+    def __input_key(self, name: str) -> str | None:
+        if not self.nodes[name].key_on_output or self.store is None or self.key(name) is None:
+            return self.key(name)
+        if name not in self.__output_keys:
+            # Run (or load) the node ahead of its consumers, its output is stored for the main run.
+            # Dtypes may change through the store, so the stored output is hashed whenever there is one
+            output = self.run([name])[name]
+            stored = self.store.load(name, self.key(name))
+            self.__output_keys[name] = output_hash(output if stored is None else stored)
+        return self.__output_keys[name]
+
+    def __needed_nodes(self, targets: list[str], stored: dict[str, str]) -> set[str]:
+        needed = set()
+        to_visit = list(targets)
+        while to_visit:
+            name = to_visit.pop()
+            if name in needed:
+                continue
+            needed.add(name)
+
+            node = self.nodes[name]
+            key = self.key(name) if self.store is not None and node.persist else None
+            if key is not None and self.store.contains(name, key):
+                # The stored output replaces the whole upstream branch
+                stored[name] = key
+            else:
+                to_visit.extend(self.__graph[name])
+        return needed
+
+    def __run_node(self, name: str, args: list) -> object:
+        logger.info("Running node %s", name)
+        node = self.nodes[name]
+        with stage(name, args[0] if args else None) as register_output:
+            output = node.func(*args)
+            register_output(output)
+
+        if node.persist and self.store is not None:
+            key = self.key(name)
+            if key is not None:
+                self.store.save(name, key, output)
+        return output
+
+    def __load_stored(self, name: str, key: str) -> object:
+        logger.info("Reusing stored node %s", name)
+        with stage(name) as register_output:
+            output = self.store.load(name, key)
+            register_output(output)
+        return output
+
+    def __validate(self):
+        for name, inputs in self.__graph.items():
+            unknown = inputs - self.nodes.keys()
+            if unknown:
+                raise ValueError(f"Node {name} has unknown inputs: {', '.join(sorted(unknown))}")
+        try:
+            TopologicalSorter(self.__graph).prepare()
+        except CycleError as error:
+            raise ValueError(f"Pipeline has a cycle: {' -> '.join(error.args[1])}") from error
+
+    def __resolve(self, outputs: dict[str, object], ref: str) -> object:
+        name, index = self.__split(ref)
+        output = outputs[name]
+        return output if index is None else output[index]
+
+    @staticmethod
+    def __split(ref: str) -> tuple[str, int | None]:
+        name, _, index = ref.partition('.')
+        return name, int(index) if index else None
@@ -0,0 +1,146 @@
+from collections import OrderedDict
+from pathlib import Path
+import threading
+
+import pandas as pd
+
+from src.extractors import SqliteExtractor
+from src.loaders import SqliteLoader
+
+
+class QueryService:
+    """Read API over the output database with filters pushed down into SQL and cached results.
+
+    Queries go through a SqliteExtractor, whose engine and connection pool are shared by
+    every extractor of the same database. Filters on countries, continents and years are
+    bound parameters, so SQLite can use the indexes created by the loader on those columns.
+
+    Results are kept in an LRU cache tagged with the generation the SqliteLoader recorded
+    for the table. The generation is read before every query, so a table written since a
+    result was cached, by this process or any other, is queried again. Tables without a
+    generation (not written by SqliteLoader) are never cached.
+    """
+
+    filter_columns = {'countries': 'Country Code', 'continents': 'Continent', 'years': 'Year'}
+
+    def __init__(self, db_path: str | Path, cache_size: int = 128):
+        self.extractor = SqliteExtractor(db_path)
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self.__cache: OrderedDict[tuple, tuple[int, pd.DataFrame]] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def query(self,
+              table: str,
+              columns: list[str] | None = None,
+              countries: list[str] | None = None,
+              continents: list[str] | None = None,
+              years: tuple[int | None, int | None] | None = None) -> pd.DataFrame:
+        """Query the rows of a table matching every given filter
+
+        Args:
+            table (str): Table name
+            columns (list[str] | None, optional): Columns to return. Defaults to all of them.
+            countries (list[str] | None, optional): Country codes. Defaults to None.
+            continents (list[str] | None, optional): Continents. Defaults to None.
+            years (tuple[int | None, int | None] | None, optional): First and last year, both included, None for unbounded. Defaults to None.
+
+        Returns:
+            pd.DataFrame: Matching rows in table order
+        """
+        key = (table,
+               None if columns is None else tuple(columns),
+               None if countries is None else tuple(countries),
+               None if continents is None else tuple(continents),
+               None if years is None else tuple(years))
+        generation = self.generation(table)
+        with self.__lock:
+            cached = self.__cache.get(key)
+            if cached is not None and generation is not None and cached[0] == generation:
+                self.__cache.move_to_end(key)
+                self.hits += 1
+                return cached[1].copy()
+            self.misses += 1
+
+        df = self.__read(table, columns, countries, continents, years)
+        if generation is not None and self.cache_size > 0:
+            with self.__lock:
+                self.__cache[key] = (generation, df)
+                self.__cache.move_to_end(key)
+                while len(self.__cache) > self.cache_size:
+                    self.__cache.popitem(last=False)
+        return df.copy()
+
+    def generation(self, table: str) -> int | None:
+        """Generation of a table, bumped by SqliteLoader on every write
+
+        Args:
+            table (str): Table name
+
+        Returns:
+            int | None: Table generation or None if the table has none
+        """
+        from sqlalchemy.exc import OperationalError
+
+        sql = f'SELECT generation FROM {self.__quote(SqliteLoader.GENERATIONS_TABLE)} WHERE table_name = ?'
+        try:
+            with self.extractor.engine.connect() as connection:
+                return connection.exec_driver_sql(sql, (table,)).scalar()
+        except OperationalError:
+            # Database written before generations were recorded
+            return None
+
+    def clear_cache(self):
+        with self.__lock:
+            self.__cache.clear()
+
+    def __read(self, table: str, columns: list[str] | None, countries: list[str] | None,
+               continents: list[str] | None, years: tuple[int | None, int | None] | None) -> pd.DataFrame:
+        from sqlalchemy import bindparam, text
+
+        table_columns = self.__table_columns(table)
+        selected = table_columns if columns is None else columns
+        self.__check_columns(table, table_columns, selected)
+
+        conditions, params, expanding = [], {}, []
+        for name, values in (('countries', countries), ('continents', continents)):
+            if values is not None:
+                self.__check_columns(table, table_columns, [self.filter_columns[name]])
+                conditions.append(f'{self.__quote(self.filter_columns[name])} IN :{name}')
+                params[name] = list(values)
+                expanding.append(bindparam(name, expanding=True))
+        if years is not None:
+            year_column = self.__quote(self.filter_columns['years'])
+            self.__check_columns(table, table_columns, [self.filter_columns['years']])
+            first_year, last_year = years
+            if first_year is not None:
+                conditions.append(f'{year_column} >= :first_year')
+                params['first_year'] = int(first_year)
+            if last_year is not None:
+                conditions.append(f'{year_column} <= :last_year')
+                params['last_year'] = int(last_year)
+
+        sql = f"SELECT {', '.join(self.__quote(column) for column in selected)} FROM {self.__quote(table)}"
+        if conditions:
+            sql += f" WHERE {' AND '.join(conditions)}"
+        # Index lookups may return rows out of order
+        sql += ' ORDER BY rowid'
+        return self.extractor.extract(text(sql).bindparams(*expanding), params)
+
+    def __table_columns(self, table: str) -> list[str]:
+        with self.extractor.engine.connect() as connection:
+            columns = [row[1] for row in connection.exec_driver_sql(f'PRAGMA table_info({self.__quote(table)})')]
+        if not columns:
+            raise ValueError(f"Unknown table: {table}")
+        return columns
+
+    @staticmethod
+    def __check_columns(table: str, table_columns: list[str], columns: list[str]):
+        unknown = [column for column in columns if column not in table_columns]
+        if unknown:
+            raise ValueError(f"Table {table} has no columns: {', '.join(unknown)}")
+
+    @staticmethod
+    def __quote(identifier: str) -> str:
+        return '"{}"'.format(identifier.replace('"', '""'))
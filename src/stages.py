@@ -0,0 +1,101 @@
+import hashlib
+import json
+import logging
+from pathlib import Path
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def output_hash(output: pd.DataFrame | tuple[pd.DataFrame, ...]) -> str:
+    """Hash the content of a stage output, its columns, dtypes and values
+
+    Args:
+        output (pd.DataFrame | tuple[pd.DataFrame, ...]): Stage output
+
+    Returns:
+        str: Content hash
+    """
+    digest = hashlib.sha256()
+    for df in output if isinstance(output, tuple) else (output,):
+        digest.update(json.dumps([[str(column), str(dtype)] for column, dtype in df.dtypes.items()]).encode())
+        digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class StageStore:
+    """Persists stage outputs as Feather files next to a manifest with the key they were computed for."""
+
+    def __init__(self, store_dir: str | Path):
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+
+    def contains(self, name: str, key: str) -> bool:
+        """Check whether the stored output of a stage was computed for a key
+
+        Args:
+            name (str): Stage name
+            key (str): Expected stage key
+
+        Returns:
+            bool: Whether an up to date output is stored
+        """
+        manifest_path = self.__manifest_path(name)
+        return manifest_path.exists() and json.loads(manifest_path.read_text())['key'] == key
+
+    def load(self, name: str, key: str) -> pd.DataFrame | tuple[pd.DataFrame, ...] | None:
+        """Recover the stored output of a stage
+
+        Args:
+            name (str): Stage name
+            key (str): Expected stage key
+
+        Returns:
+            pd.DataFrame | tuple[pd.DataFrame, ...] | None: Stored output or None if missing or stale
+        """
+        import pyarrow.feather as feather
+
+        manifest_path = self.__manifest_path(name)
+        if not manifest_path.exists():
+            return None
+
+        manifest = json.loads(manifest_path.read_text())
+        if manifest['key'] != key:
+            return None
+
+        dfs = tuple(feather.read_table(self.__frame_path(name, i), memory_map=True).to_pandas() for i in range(manifest['frames']))
+        return dfs if manifest['multiple'] else dfs[0]
+
+    def save(self, name: str, key: str, output: pd.DataFrame | tuple[pd.DataFrame, ...]) -> bool:
+        """Store the output of a stage
+
+        Args:
+            name (str): Stage name
+            key (str): Stage key
+            output (pd.DataFrame | tuple[pd.DataFrame, ...]): Stage output
+
+        Returns:
+            bool: Whether the output could be stored
+        """
+        import pyarrow as pa
+        import pyarrow.feather as feather
+
+        multiple = isinstance(output, tuple)
+        dfs = output if multiple else (output,)
+        try:
+            tables = [pa.Table.from_pandas(df, preserve_index=False) for df in dfs]
+        except (pa.ArrowException, TypeError, ValueError):
+            logger.warning("Stage %s output can not be stored, it will be recomputed on every run", name)
+            return False
+
+        for i, table in enumerate(tables):
+            feather.write_feather(table, self.__frame_path(name, i))
+        self.__manifest_path(name).write_text(json.dumps({'key': key, 'frames': len(dfs), 'multiple': multiple}))
+        return True
+
+    def __manifest_path(self, name: str) -> Path:
+        return self.store_dir / f'{name}.json'
+
+    def __frame_path(self, name: str, i: int) -> Path:
+        return self.store_dir / f'{name}.{i}.feather'
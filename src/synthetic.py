@@ -0,0 +1,205 @@
+import copy
+import logging
+from pathlib import Path
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BASE_COUNTRIES = 200
+CONTINENTS = ['Africa', 'Asia', 'Europe', 'North America', 'Oceania', 'South America']
+EMISSION_CATEGORIES = [
+    'carbon_dioxide_co2_emissions_without_land_use_land_use_change_and_forestry_lulucf_in_kilotonne_co2_equivalent',
+    'greenhouse_gas_ghgs_emissions_including_indirect_co2_without_lulucf_in_kilotonne_co2_equivalent',
+    'greenhouse_gas_ghgs_emissions_without_land_use_land_use_change_and_forestry_lulucf_in_kilotonne_co2_equivalent',
+    'hydrofluorocarbons_hfcs_emissions_in_kilotonne_co2_equivalent',
+    'methane_ch4_emissions_without_land_use_land_use_change_and_forestry_lulucf_in_kilotonne_co2_equivalent',
+    'nitrous_oxide_n2o_emissions_without_land_use_land_use_change_and_forestry_lulucf_in_kilotonne_co2_equivalent',
+    'sulphur_hexafluoride_sf6_emissions_in_kilotonne_co2_equivalent',
+    'unspecified_mix_of_hydrofluorocarbons_hfcs_and_perfluorocarbons_pfcs_emissions_in_kilotonne_co2_equivalent',
+]
+POPULATION_YEARS = [2022, 2020, 2015, 2010, 2000, 1990, 1980, 1970]
+XLS_MAX_ROWS = 65536
+
+
+class SyntheticDataGenerator:
+    """Writes source files with the schema of the real datasets for a scaled number of countries.
+
+    The generated files mimic the UN emissions CSV and the Kaggle population CSV (both
+    zipped, as downloaded), the Maddison pib xlsx and the World Bank renewable energy xls.
+    A scale of 1 matches the size of the real datasets.
+    """
+
+    def __init__(self, root_dir: str | Path | None, scale: float = 1, seed: int = 0):
+        # Without a root_dir the frames can still be generated in memory
+        self.root_dir = Path(root_dir) if root_dir is not None else None
+        self.n_countries = max(int(BASE_COUNTRIES * scale), 1)
+        self.rng = np.random.default_rng(seed)
+        self.codes = np.array([self.__country_code(i) for i in range(self.n_countries)], dtype=object)
+        self.names = np.array([f'Country {i}' for i in range(self.n_countries)], dtype=object)
+
+    def write_all(self, config: dict) -> dict:
+        """Write every source and return a copy of the config pointing to them
+
+        Args:
+            config (dict): Configuration dictionary
+
+        Returns:
+            dict: Configuration dictionary reading from the generated files
+        """
+        config = copy.deepcopy(config)
+        config['data_dir']['root_dir'] = str(self.root_dir)
+        for source, writer in [('global_emissions', self.write_emissions),
+                               ('population', self.write_population),
+                               ('pib', self.write_pib),
+                               ('renewable_energy', self.write_energy)]:
+            source_config = config['data_dir'][source]
+            source_config['extension'] = writer(self.root_dir / source_config['folder'] / source_config['file']).suffix[1:]
+        return config
+
+    def emissions_df(self) -> pd.DataFrame:
+        years = np.arange(1990, 2015)
+        country_idx, year_idx, category_idx = [grid.ravel() for grid in np.meshgrid(np.arange(self.n_countries),
+                                                                                   np.arange(len(years)),
+                                                                                   np.arange(len(EMISSION_CATEGORIES)),
+                                                                                   indexing='ij')]
+        keep = self.rng.random(len(country_idx)) < 0.9
+        return pd.DataFrame({'country_or_area': self.names[country_idx[keep]],
+                             'year': years[year_idx[keep]],
+                             'value': self.rng.random(keep.sum()) * 1e5,
+                             'category': np.array(EMISSION_CATEGORIES, dtype=object)[category_idx[keep]]})
+
+    def population_df(self) -> pd.DataFrame:
+        df = pd.DataFrame({'Rank': np.arange(1, self.n_countries + 1),
+                           'CCA3': self.codes,
+                           'Country/Territory': self.names,
+                           'Capital': 'Capital',
+                           'Continent': self.rng.choice(CONTINENTS, self.n_countries)})
+        for year in POPULATION_YEARS:
+            df[f'{year} Population'] = self.rng.integers(1e4, 1e9, self.n_countries)
+        df['Area (km²)'] = self.rng.integers(1, 1e7, self.n_countries)
+        df['Density (per km²)'] = self.rng.random(self.n_countries) * 1e3
+        df['Growth Rate'] = 1 + self.rng.random(self.n_countries) / 10
+        df['World Population Percentage'] = self.rng.random(self.n_countries)
+        return df
+
+    def energy_df(self) -> pd.DataFrame:
+        years = [str(year) for year in range(1960, 2024)]
+        values = self.rng.random((self.n_countries, len(years))) * 100
+        values[self.rng.random(values.shape) < 0.2] = np.nan
+        return pd.DataFrame({'Country Name': self.names,
+                             'Country Code': self.codes,
+                             'Indicator Name': 'Renewable electricity output (% of total electricity output)',
+                             'Indicator Code': 'EG.ELC.RNEW.ZS',
+                             **dict(zip(years, values.T))})
+
+    def write_emissions(self, file_path: Path) -> Path:
+        return self.__write_zipped_csv(self.emissions_df(), file_path, 'greenhouse_gas_inventory_data_data.csv')
+
+    def write_population(self, file_path: Path) -> Path:
+        return self.__write_zipped_csv(self.population_df(), file_path, 'world_population.csv')
+
+    def write_pib(self, file_path: Path) -> Path:
+        years = np.arange(1950, 2019)
+        country_idx = np.repeat(np.arange(self.n_countries), len(years))
+        df = pd.DataFrame({'countrycode': self.codes[country_idx],
+                           'country': self.names[country_idx],
+                           'year': np.tile(years, self.n_countries),
+                           'gdppc': self.rng.random(len(country_idx)) * 5e4,
+                           'pop': self.rng.random(len(country_idx)) * 1e5})
+        file_path = file_path.with_suffix('.xlsx')
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
+            pd.DataFrame({'Maddison Project Database 2020': ['Synthetic data']}).to_excel(writer, sheet_name='Description', index=False)
+            df.to_excel(writer, sheet_name='Full data', index=False)
+        return file_path
+
+    def write_energy(self, file_path: Path) -> Path:
+        df = self.energy_df()
+        metadata = [['Data Source', 'World Development Indicators'], ['Last Updated Date', '2025-01-01'], []]
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+
+        try:
+            import xlwt
+        except ImportError:
+            xlwt = None
+
+        if xlwt is None or len(df) + len(metadata) >= XLS_MAX_ROWS:
+            # pandas can not write legacy xls files, fall back to an xlsx with the same layout
+            logger.warning("Writing the energy source as xlsx, xlwt is not installed or the sheet exceeds the xls row limit")
+            file_path = file_path.with_suffix('.xlsx')
+            with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
+                pd.DataFrame(metadata).to_excel(writer, sheet_name='Data', index=False, header=False)
+                df.to_excel(writer, sheet_name='Data', index=False, startrow=len(metadata))
+            return file_path
+
+        file_path = file_path.with_suffix('.xls')
+        workbook = xlwt.Workbook()
+        sheet = workbook.add_sheet('Data')
+        for i, row in enumerate(metadata):
+            for j, value in enumerate(row):
+                sheet.write(i, j, value)
+        for j, column in enumerate(df.columns):
+            sheet.write(len(metadata), j, column)
+            for i, value in enumerate(df[column].tolist(), start=len(metadata) + 1):
+                if not (isinstance(value, float) and np.isnan(value)):
+                    sheet.write(i, j, value)
+        workbook.save(str(file_path))
+        return file_path
+
+    @staticmethod
+    def __write_zipped_csv(df: pd.DataFrame, file_path: Path, member: str) -> Path:
+        file_path = file_path.with_suffix('.zip')
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        with zipfile.ZipFile(file_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            with archive.open(member, 'w') as file:
+                df.to_csv(file, index=False)
+        return file_path
+
+    @staticmethod
+    def __country_code(i: int) -> str:
+        letters = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+        code = ''
+        while True:
+            i, remainder = divmod(i, 26)
+            code = letters[remainder] + code
+            if i == 0:
+                return code.rjust(3, 'A')
+
+
+def synthetic_merge_inputs(n_countries: int, n_years: int, seed: int = 0) -> tuple[pd.DataFrame, ...]:
+    """Generate transformed energy, emissions, pib and population frames.
+
+    Args:
+        n_countries (int): Number of countries
+        n_years (int): Number of years
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        tuple[pd.DataFrame, ...]: Energy, emissions, pib and population DataFrames
+    """
+    rng = np.random.default_rng(seed)
+    codes = np.array([f'C{i:05d}' for i in range(n_countries)], dtype=object)
+    names = np.array([f'Country {i}' for i in range(n_countries)], dtype=object)
+    years = np.arange(1990, 1990 + n_years)
+    country_idx = np.repeat(np.arange(n_countries), n_years)
+    year_col = np.tile(years, n_countries)
+
+    def sample(fraction: float) -> np.ndarray:
+        return np.flatnonzero(rng.random(len(country_idx)) < fraction)
+
+    keep = sample(0.9)
+    energy = pd.DataFrame({'Country Code': codes[country_idx[keep]], 'Country Name': names[country_idx[keep]],
+                           'Year': year_col[keep], 'Energy': rng.random(len(keep)) * 100})
+    keep = sample(0.8)
+    emissions = pd.DataFrame({'Country Code': codes[country_idx[keep]], 'Country Name': names[country_idx[keep]],
+                              'Year': year_col[keep], **{gas: rng.random(len(keep)) * 1e4 for gas in ['co2', 'ch4', 'n2o', 'sf6']}})
+    keep = sample(0.95)
+    pib = pd.DataFrame({'Country Code': codes[country_idx[keep]], 'Country Name': names[country_idx[keep]],
+                        'Year': year_col[keep], 'pib': rng.random(len(keep)) * 1e4})
+    population = pd.DataFrame({'Country Code': codes, 'Country Name': names,
+                               'Continent': rng.choice(CONTINENTS[:4], n_countries),
+                               'Population': rng.integers(1e5, 1e9, n_countries)})
+    return energy, emissions, pib, population
@@ -1,55 +1,90 @@
 from abc import ABC, abstractmethod
 
+from collections.abc import Iterable
+
+import numpy as np
 import pandas as pd
 
+from src.instrumentation import instrument_class
+from src.lazy import LazyFrame, as_lazy
+from src.lookup import CountryLookup
+from src.utils import concat_chunks
+
 class BaseTransformer(ABC):
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        instrument_class(cls, 'transform')
+
     @abstractmethod
     def transform(self, data):
         pass
 
 class PopulationTransformer(BaseTransformer):
-    def __init__(self, df: pd.DataFrame):
-        self.df = df
+    def __init__(self, df: pd.DataFrame | Iterable[pd.DataFrame] | LazyFrame):
+        self.plan = df if isinstance(df, LazyFrame) else LazyFrame.from_frame(concat_chunks(df))
 
     def transform(self):
         self.select_columns()
+        self.df = self.plan.collect()
         return self.df
     
     def select_columns(self):
         columns = ['CCA3', 'Country/Territory', 'Continent', '2010 Population']
-        self.df = self.df[columns]
-        self.df.rename(columns={'CCA3': 'Country Code','Country/Territory': 'Country Name', '2010 Population': 'Population'}, inplace=True)
+        self.plan = self.plan.select(columns).rename({'CCA3': 'Country Code','Country/Territory': 'Country Name', '2010 Population': 'Population'})
+
+class CountryLookupTransformer(BaseTransformer):
+    """Builds the country lookup shared by the emissions, pib and merge transformers.
+
+    Population names come first so they are the canonical country names, energy adds
+    its codes and spellings, and aliases map the remaining known variants to a code.
+    """
+
+    def __init__(self, population_df: pd.DataFrame, energy_df: pd.DataFrame | None = None, aliases: dict[str, str] | None = None):
+        self.sources = [df for df in (population_df, energy_df) if df is not None]
+        self.aliases = aliases
+
+    def transform(self) -> pd.DataFrame:
+        return CountryLookup.build(self.sources, self.aliases).df
 
 class EnergyTransformer(BaseTransformer):
+    """Melts the yearly renewable share columns of the years in the window into rows."""
     
-    def __init__(self, df: pd.DataFrame):
-        self.df = df
+    def __init__(self, df: pd.DataFrame | LazyFrame, start_year: int = 1990, end_year: int = 2014):
+        self.plan = as_lazy(df)
+        self.start_year = start_year
+        self.end_year = end_year
 
     def transform(self) -> pd.DataFrame:
         self.__select_columns()
-        self.__transpose_df()
+        self.__melt_years()
         # self.__add_population_column()
-        self.__delete_na_rows()
-        self.__cast_year_to_int()
         # self.__calculate_per_capita_energy()
         # self.__calculate_mean_parameters()
         return self.df
     
-    def __select_columns(self) -> pd.DataFrame:
-        columns = self.__generate_columns()
-        self.df = self.df[columns]
-    
     @staticmethod
     def __generate_columns(init: int = 1990, end: int = 2014) -> list[str]:
         dates = [str(year) for year in range(init, end + 1)]
         columns = ['Country Code', 'Country Name'] + dates
         return columns
     
-    def __transpose_df(self):
-        self.df = self.df.melt(id_vars=['Country Code', 'Country Name'], var_name='Year', value_name='Energy')
+    def __select_columns(self):
+        # Only the year columns of the window are read from the source
+        self.df = self.plan.select(self.__generate_columns(self.start_year, self.end_year)).collect()
 
-    def __delete_na_rows(self):
-        self.df = self.df.dropna(subset=['Energy'])
+    def __melt_years(self):
+        # Same rows, order and index labels as melt + dropna, without building the NA rows:
+        # the year columns are stacked once and only the positions of non-NA values are taken
+        columns = self.__generate_columns(self.start_year, self.end_year)
+        id_columns, year_columns = columns[:2], columns[2:]
+        values = np.stack([self.df[column].to_numpy() for column in year_columns]).ravel()
+        positions = np.flatnonzero(pd.notna(values))
+        year_positions, country_positions = np.divmod(positions, len(self.df))
+
+        long = {column: self.df[column].array.take(country_positions) for column in id_columns}
+        long['Year'] = np.array(year_columns).astype(int)[year_positions]
+        long['Energy'] = values[positions]
+        self.df = pd.DataFrame(long, index=pd.Index(positions), copy=False)
     
     def __add_population_column(self):
         merged_df = pd.merge(self.df, self.population_df, how='left', left_on=['Country Code'], right_on=['Country Code'])
@@ -62,116 +97,324 @@ class EnergyTransformer(BaseTransformer):
     def __calculate_mean_parameters(self):
         self.df = self.df.groupby(['Country Code', 'Country Name'], as_index=False).agg({'Energy': 'mean', 'Energy per Capita': 'mean'})
 
-    def __cast_year_to_int(self):
-        self.df['Year'] = self.df['Year'].astype(int)
 class EmissionsTransformer(BaseTransformer):
-    def __init__(self, df: pd.DataFrame, population_df: pd.DataFrame):
-        self.df: pd.DataFrame = df
+    """Pivots the emission categories into columns and adds the country codes.
+
+    The wide frame is built in a single array from the codes of country, year and
+    category: categories with too many missing values and rows without a country are
+    left out while reshaping, and codes are looked up once per distinct country name.
+    With a country lookup, names are matched in any of their known spellings and
+    replaced by the canonical name. The year window is applied after pivoting, so the
+    categories kept do not depend on it.
+    """
+
+    emission_mapper = {'year': 'Year',
+                       'carbon_dioxide_co2_emissions_without_land_use_land_use_change_and_forestry_lulucf_in_kilotonne_co2_equivalent': 'co2', 
+                       'greenhouse_gas_ghgs_emissions_including_indirect_co2_without_lulucf_in_kilotonne_co2_equivalent': 'ghg_no_co2', 
+                       'greenhouse_gas_ghgs_emissions_without_land_use_land_use_change_and_forestry_lulucf_in_kilotonne_co2_equivalent': 'ghg_co2', 
+                       'hydrofluorocarbons_hfcs_emissions_in_kilotonne_co2_equivalent': 'hfcs', 
+                       'methane_ch4_emissions_without_land_use_land_use_change_and_forestry_lulucf_in_kilotonne_co2_equivalent': 'ch4', 
+                       'nitrous_oxide_n2o_emissions_without_land_use_land_use_change_and_forestry_lulucf_in_kilotonne_co2_equivalent': 'n2o', 
+                       'sulphur_hexafluoride_sf6_emissions_in_kilotonne_co2_equivalent': 'sf6'}
+
+    def __init__(self,
+                 df: pd.DataFrame | Iterable[pd.DataFrame],
+                 population_df: pd.DataFrame,
+                 lookup_df: pd.DataFrame | None = None,
+                 start_year: int | None = None,
+                 end_year: int | None = None):
+        self.df: pd.DataFrame = concat_chunks(df)
         self.population_df = population_df
+        self.lookup = None if lookup_df is None else CountryLookup(lookup_df)
+        self.start_year = start_year
+        self.end_year = end_year
 
     def transform(self) -> pd.DataFrame:
         self.__pivot_df()
-        self.__drop_na_columns()
-        self.__drop_na_rows()
+        self.__filter_years()
         self.__add_country_codes()
         self.__rename_columns()
         return self.df
     
-    def __pivot_df(self):
-        self.df = self.df.pivot(columns='category', values='value', index=['country_or_area', 'year']).reset_index()
-        
-    def __drop_na_columns(self, na_threshold: int = 200):
-        na_counts = self.df.isna().sum()
-        cols_to_drop = na_counts[na_counts > na_threshold].index.tolist()
-        if cols_to_drop:
-            self.df = self.df.drop(columns=cols_to_drop)
-    
-    def __drop_na_rows(self):
-        self.df = self.df.dropna(subset=['country_or_area'])
+    def __pivot_df(self, na_threshold: int = 200):
+        # Rows follow DataFrame.pivot: countries sorted by name with missing ones first, then years
+        country_ids = self.__sorted_codes(self.df['country_or_area']) + 1
+        year_ids, years = pd.factorize(self.df['year'], sort=True, use_na_sentinel=False)
+        category_ids, categories = pd.factorize(self.df['category'], sort=True)
+        values = self.df['value'].to_numpy()
+        present = category_ids >= 0
+        if not present.all():
+            country_ids, year_ids, category_ids, values = (ids[present] for ids in (country_ids, year_ids, category_ids, values))
+
+        # Country and year codes are dense, so rows are found with a direct address table instead of hashing
+        n_years = max(len(years), 1)
+        pairs = country_ids * n_years + year_ids
+        rows = np.flatnonzero(np.bincount(pairs, minlength=(country_ids.max(initial=0) + 1) * n_years))
+        row_lookup = np.zeros(rows[-1] + 1 if len(rows) else 0, dtype=np.int64)
+        row_lookup[rows] = np.arange(len(rows))
+        row_ids = row_lookup[pairs]
+        del pairs, row_lookup
+
+        n_rows, n_categories = len(rows), len(categories)
+        if np.bincount(row_ids * n_categories + category_ids, minlength=n_rows * n_categories).max(initial=0) > 1:
+            raise ValueError("Index contains duplicate entries, cannot reshape")
+
+        # Missing values of a category: its rows without a non-NA value
+        na_counts = n_rows - np.bincount(category_ids[pd.notna(values)], minlength=n_categories)
+        keep_categories = np.flatnonzero(na_counts <= na_threshold)
+        rows_with_country = np.flatnonzero(rows // n_years > 0)
+
+        dtype = values.dtype if values.dtype.kind == 'f' else np.float64
+        column_positions = np.full(n_categories, -1)
+        column_positions[keep_categories] = np.arange(len(keep_categories))
+        row_positions = np.full(n_rows, -1)
+        row_positions[rows_with_country] = np.arange(len(rows_with_country))
+        wide = np.full((len(keep_categories), len(rows_with_country)), np.nan, dtype=dtype)
+        assigned = (column_positions[category_ids] >= 0) & (row_positions[row_ids] >= 0)
+        wide[column_positions[category_ids[assigned]], row_positions[row_ids[assigned]]] = values[assigned]
+
+        # Country and year of each row, taken from its first occurrence to keep their dtypes
+        first_occurrence = np.full(n_rows, len(row_ids))
+        np.minimum.at(first_occurrence, row_ids, np.arange(len(row_ids)))
+        source_rows = np.flatnonzero(present)[first_occurrence[rows_with_country]]
+        self.df = pd.DataFrame({'country_or_area': self.df['country_or_area'].array.take(source_rows),
+                                'year': self.df['year'].array.take(source_rows),
+                                **{category: wide[i] for i, category in enumerate(categories[keep_categories])}}, copy=False)
+
+    def __filter_years(self):
+        if self.start_year is None and self.end_year is None:
+            return
+        years = self.df['year']
+        mask = np.ones(len(years), dtype=bool)
+        if self.start_year is not None:
+            mask &= (years >= self.start_year).to_numpy()
+        if self.end_year is not None:
+            mask &= (years <= self.end_year).to_numpy()
+        if not mask.all():
+            self.df = self.df[mask].reset_index(drop=True)
+
+    @staticmethod
+    def __sorted_codes(column: pd.Series) -> np.ndarray:
+        # Codes ranking the values in lexical order, -1 for missing values
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            ranks = column.cat.categories.argsort().argsort()
+            codes = column.cat.codes.to_numpy()
+            return np.where(codes >= 0, ranks[codes], -1)
+        return pd.factorize(column, sort=True)[0]
 
     def __add_country_codes(self):
-        columns = ['Country Code', 'Country Name'] + self.df.columns.tolist()
-        self.df = pd.merge(self.df, self.population_df[['Country Code', 'Country Name']], how='left', left_on=['country_or_area'], right_on=['Country Name'])
-        self.__order_columns(columns)
+        if self.lookup is not None:
+            ids = self.lookup.name_ids(self.df['country_or_area'])
+            codes = {'Country Code': self.lookup.country_codes(ids), 'Country Name': self.lookup.country_names(ids)}
+            self.df = pd.DataFrame({**codes, **{column: self.df[column] for column in self.df.columns if column != 'country_or_area'}}, copy=False)
+            return
+
+        names = pd.Index(self.population_df['Country Name'])
+        if not names.is_unique:
+            # Duplicated names repeat rows in the merge
+            columns = ['Country Code', 'Country Name'] + self.df.columns.tolist()
+            self.df = pd.merge(self.df, self.population_df[['Country Code', 'Country Name']], how='left', left_on=['country_or_area'], right_on=['Country Name'])
+            self.__order_columns(columns)
+            return
+
+        country_ids, countries = pd.factorize(self.df['country_or_area'])
+        positions = names.get_indexer(countries)[country_ids]
+        codes = {column: self.population_df[column].array.take(positions, allow_fill=True) for column in ['Country Code', 'Country Name']}
+        self.df = pd.DataFrame({**codes, **{column: self.df[column] for column in self.df.columns if column != 'country_or_area'}}, copy=False)
 
     def __order_columns(self, columns: list[str]):
         self.df = self.df[columns]
         self.df.drop(labels='country_or_area', axis=1, inplace=True)
 
     def __rename_columns(self):
-        emission_mapper = {'year': 'Year',
-                          'carbon_dioxide_co2_emissions_without_land_use_land_use_change_and_forestry_lulucf_in_kilotonne_co2_equivalent': 'co2', 
-                          'greenhouse_gas_ghgs_emissions_including_indirect_co2_without_lulucf_in_kilotonne_co2_equivalent': 'ghg_no_co2', 
-                          'greenhouse_gas_ghgs_emissions_without_land_use_land_use_change_and_forestry_lulucf_in_kilotonne_co2_equivalent': 'ghg_co2', 
-                          'hydrofluorocarbons_hfcs_emissions_in_kilotonne_co2_equivalent': 'hfcs', 
-                          'methane_ch4_emissions_without_land_use_land_use_change_and_forestry_lulucf_in_kilotonne_co2_equivalent': 'ch4', 
-                          'nitrous_oxide_n2o_emissions_without_land_use_land_use_change_and_forestry_lulucf_in_kilotonne_co2_equivalent': 'n2o', 
-                          'sulphur_hexafluoride_sf6_emissions_in_kilotonne_co2_equivalent': 'sf6'}
-        self.df.rename(columns=emission_mapper, inplace=True)
+        self.df.rename(columns=self.emission_mapper, inplace=True)
 
 class PibTransformer(BaseTransformer):
-    def __init__(self, df: pd.DataFrame):
-        self.df = df
+    """Keeps the GDP per capita of the years in the window.
+
+    Columns, year filter and renames are recorded on a LazyFrame, so with a lazy
+    source the unused columns and years are dropped while the sheet is read.
+    """
+
+    def __init__(self,
+                 df: pd.DataFrame | LazyFrame,
+                 lookup_df: pd.DataFrame | None = None,
+                 start_year: int = 1990,
+                 end_year: int = 2014):
+        self.plan = as_lazy(df)
+        self.lookup = None if lookup_df is None else CountryLookup(lookup_df)
+        self.start_year = start_year
+        self.end_year = end_year
 
     def transform(self) -> pd.DataFrame:
         self.__filter_columns()
         self.__filter_dates()
         self.__rename_columns()
+        self.df = self.plan.collect()
+        if self.lookup is not None:
+            self.__canonical_names()
         return self.df
     
     def __filter_columns(self):
-        self.df.drop(labels='pop', axis=1, inplace=True)
+        self.plan = self.plan.select(['countrycode', 'country', 'year', 'gdppc'])
 
-    def __filter_dates(self, start_year: int = 1990, end_year: int = 2014):
-        self.df = self.df[(self.df['year'] >= start_year) & (self.df['year'] <= end_year)]
+    def __filter_dates(self):
+        self.plan = self.plan.filter('year', '>=', self.start_year).filter('year', '<=', self.end_year)
 
     def __rename_columns(self):
-        self.df.rename(columns={'countrycode': 'Country Code', 'country':  'Country Name', 'year': 'Year', 'gdppc': 'pib'}, inplace=True)
+        self.plan = self.plan.rename({'countrycode': 'Country Code', 'country':  'Country Name', 'year': 'Year', 'gdppc': 'pib'})
+
+    def __canonical_names(self):
+        # Countries missing from the lookup keep their own name
+        ids = self.lookup.code_ids(self.df['Country Code'])
+        names = pd.Series(self.lookup.country_names(ids), index=self.df.index, dtype=object)
+        self.df = self.df.assign(**{'Country Name': names.fillna(self.df['Country Name'].astype(object))})
 
 
 class MergeTransformer(BaseTransformer):
-    def __init__(self, energy_df: pd.DataFrame, emissions_df: pd.DataFrame, pib_df: pd.DataFrame, population_df: pd.DataFrame):
-        self.energy_df = energy_df
-        self.emissions_df = emissions_df
-        self.pib_df = pib_df
+    """Inner joins energy, emissions and pib on (country, year) and adds population stats.
+
+    Country code/name pairs are encoded once into integer ids and packed with the
+    year into a single int64 key. The joins only compute row positions on those keys
+    and every output column is gathered once from its source frame, instead of
+    copying the whole intermediate frame on each string-keyed merge.
+
+    With a country lookup, countries are joined on their code alone and take the
+    canonical name of the lookup, so sources spelling a name differently still match.
+
+    Energy, emissions and pib are optional: the sources passed as None are left out of
+    the joins and their columns out of the output, but at least one of them is needed.
+    """
+
+    country_keys = ['Country Code', 'Country Name']
+
+    def __init__(self,
+                 energy_df: pd.DataFrame | None,
+                 emissions_df: pd.DataFrame | None,
+                 pib_df: pd.DataFrame | None,
+                 population_df: pd.DataFrame,
+                 lookup_df: pd.DataFrame | None = None):
+        # Value sources in join order, the first one drives the row order
+        self.sources = {name: df for name, df in (('energy', energy_df), ('emissions', emissions_df), ('pib', pib_df)) if df is not None}
+        if not self.sources:
+            raise ValueError("MergeTransformer needs at least one of energy, emissions or pib")
         self.population_df = population_df
+        self.lookup = None if lookup_df is None else CountryLookup(lookup_df)
 
     def transform(self) -> pd.DataFrame:
-        self.__merge_energy_emissions() # Revisar NAs
-        self.__merge_pib()
-        self.__merge_population()
-        self.__order_columns()
-        self.__apply_per_capita_stats()
+        self.__encode_countries()
+        self.__encode_years()
+        self.__join_positions()
+        self.__build_merged_df()
         return self.merged_df
-    
-    def __merge_energy_emissions(self):
-        self.merged_df = pd.merge(self.energy_df, self.emissions_df, how='inner', left_on=['Country Code', 'Country Name', 'Year'], right_on=['Country Code', 'Country Name', 'Year'])
-
-    def __merge_pib(self):
-        self.merged_df = pd.merge(self.merged_df, self.pib_df, how='inner', left_on=['Country Code', 'Country Name', 'Year'], right_on=['Country Code', 'Country Name', 'Year'])
-
-    def __merge_population(self):
-        self.merged_df = pd.merge(self.merged_df, self.population_df, how='inner', left_on=['Country Code', 'Country Name'], right_on=['Country Code', 'Country Name'])
-
-    def __order_columns(self, 
-                        first_columns: list[str] = ['Country Code', 
-                                                    'Country Name', 
-                                                    'Continent', 
-                                                    'Year', 
-                                                    'Population', 
-                                                    'pib']):
-        ordered_columns = [c for c in first_columns if c in self.merged_df.columns] + [c for c in self.merged_df.columns if c not in first_columns]
-        self.merged_df = self.merged_df[ordered_columns]
-
-    def __apply_per_capita_stats(self, 
-                                 first_columns: list[str] = ['Country Code', 
-                                                            'Country Name', 
-                                                            'Continent', 
-                                                            'Year', 
-                                                            'Population', 
-                                                            'pib']):
-        per_capita_columns = [col for col in self.merged_df.columns if col not in first_columns]
-        self.merged_df[[f'{col} per Capita' for col in per_capita_columns]] = self.merged_df[per_capita_columns].div(self.merged_df['Population'], axis=0)
+
+    def __encode_countries(self):
+        frames = [*self.sources.values(), self.population_df]
+        if self.lookup is not None:
+            self.__encode_lookup_countries(frames)
+            return
+
+        code_ids, self.country_codes = self.__factorize_shared([df['Country Code'] for df in frames])
+        name_ids, self.country_names = self.__factorize_shared([df['Country Name'] for df in frames])
+
+        # A country is the (code, name) pair, as both are merge keys
+        n_names = max(len(self.country_names), 1)
+        pair_keys = [codes.astype(np.int64) * n_names + names for codes, names in zip(code_ids, name_ids)]
+        self.country_ids, pairs = self.__factorize_shared(pair_keys)
+        self.n_countries = len(pairs)
+        self.pair_codes, self.pair_names = np.divmod(pairs.to_numpy(), n_names)
+
+    def __encode_lookup_countries(self, frames: list[pd.DataFrame]):
+        # Unknown codes get an id of their own per side, so they never match the population
+        n = len(self.lookup.codes)
+        code_ids = [self.lookup.code_ids(df['Country Code']) for df in frames]
+        self.country_ids = [np.where(ids >= 0, ids, n + (i == len(frames) - 1)) for i, ids in enumerate(code_ids)]
+        self.n_countries = n + 2
+        self.country_codes, self.country_names = self.lookup.codes, self.lookup.names
+        self.pair_codes = self.pair_names = np.arange(n)
+
+    @staticmethod
+    def __factorize_shared(columns: list[pd.Series | np.ndarray]) -> tuple[list[np.ndarray], pd.Index]:
+        # Factorize each column on its own and only combine the (small) uniques.
+        # NaN keys are kept as a value so they match each other, as in pd.merge
+        factorized = [pd.factorize(column, use_na_sentinel=False) for column in columns]
+        uniques = pd.Index(pd.concat([pd.Series(column_uniques) for _, column_uniques in factorized], ignore_index=True)).unique()
+        ids = [uniques.get_indexer(column_uniques)[codes].astype(np.int64) for codes, column_uniques in factorized]
+        return ids, uniques
+
+    def __encode_years(self):
+        years = [df['Year'].to_numpy(np.int16) for df in self.sources.values()]
+        self.first_year = min((int(year.min()) for year in years if len(year)), default=0)
+        self.year_span = max((int(year.max()) for year in years if len(year)), default=0) - self.first_year + 1
+
+        *source_ids, self.population_ids = self.country_ids
+        self.keys = {name: ids * self.year_span + (year - self.first_year)
+                     for name, ids, year in zip(self.sources, source_ids, years)}
+
+    @staticmethod
+    def __inner_join(left_keys: np.ndarray, right_keys: np.ndarray, key_space: int) -> tuple[np.ndarray, np.ndarray]:
+        # Row positions of an inner join, following the order of the left keys.
+        # Keys are dense integers, so unique right keys are looked up in a direct address table
+        if key_space <= 4 * (len(left_keys) + len(right_keys)) + 1024:
+            table = np.full(key_space, -1, dtype=np.int64)
+            table[right_keys] = np.arange(len(right_keys))
+            if np.count_nonzero(table >= 0) == len(right_keys):
+                right_positions = table[left_keys]
+                left_positions = np.flatnonzero(right_positions >= 0)
+                return left_positions, right_positions[left_positions]
+
+        right_index = pd.Index(right_keys)
+        if right_index.is_unique:
+            right_positions = right_index.get_indexer(left_keys)
+            left_positions = np.flatnonzero(right_positions >= 0)
+            return left_positions, right_positions[left_positions]
+
+        positions = pd.merge(pd.DataFrame({'key': left_keys, 'left': np.arange(len(left_keys))}),
+                             pd.DataFrame({'key': right_keys, 'right': np.arange(len(right_keys))}),
+                             on='key', how='inner')
+        return positions['left'].to_numpy(), positions['right'].to_numpy()
+
+    def __join_positions(self):
+        key_space = self.n_countries * self.year_span
+        first, *others = self.sources
+        self.first_keys = self.keys[first]
+        positions = {first: np.arange(len(self.first_keys))}
+        for name in others:
+            matched, source_positions = self.__inner_join(self.first_keys[positions[first]], self.keys[name], key_space)
+            positions = {joined: joined_positions[matched] for joined, joined_positions in positions.items()}
+            positions[name] = source_positions
+
+        countries = self.first_keys[positions[first]] // self.year_span
+        matched, population_positions = self.__inner_join(countries, self.population_ids, self.n_countries)
+        self.positions = {name: source_positions[matched] for name, source_positions in positions.items()}
+        self.positions['population'] = population_positions
+
+    def __build_merged_df(self,
+                          first_columns: list[str] = ['Country Code',
+                                                      'Country Name',
+                                                      'Continent',
+                                                      'Year',
+                                                      'Population',
+                                                      'pib']):
+        first = next(iter(self.sources))
+        keys = self.first_keys[self.positions[first]]
+        country_ids = keys // self.year_span
+        columns = {'Country Code': self.country_codes.take(self.pair_codes[country_ids]),
+                   'Country Name': self.country_names.take(self.pair_names[country_ids]),
+                   'Year': (keys % self.year_span + self.first_year).astype(self.sources[first]['Year'].dtype)}
+
+        sources = {**self.sources, 'population': self.population_df}
+        for name, df in sources.items():
+            value_columns = [col for col in df.columns if col not in self.country_keys + ['Year']]
+            columns.update({col: df[col].array.take(self.positions[name]) for col in value_columns})
+
+        ordered_columns = [c for c in first_columns if c in columns] + [c for c in columns if c not in first_columns]
+        per_capita_columns = [c for c in ordered_columns if c not in first_columns]
+        population = columns['Population']
+        merged = {col: columns[col] for col in ordered_columns}
+        merged.update({f'{col} per Capita': columns[col] / population for col in per_capita_columns})
+        # Every column is already a fresh array, skip the consolidation copy
+        self.merged_df = pd.DataFrame(merged, copy=False)
 
 class AggregateTransformer(BaseTransformer):
     def __init__(self, df: pd.DataFrame):
@@ -189,7 +432,7 @@ class AggregateTransformer(BaseTransformer):
                                                                       'Population']):
         
         aggregate_operations = {col: 'mean' for col in self.df.columns if col not in not_values_columns}
-        self.countries_df = self.df.groupby(['Country Code', 'Country Name', 'Continent'], as_index=False).agg(aggregate_operations)
+        self.countries_df = self.df.groupby(['Country Code', 'Country Name', 'Continent'], as_index=False, observed=True).agg(aggregate_operations)
 
     def __aggregate_by_continent(self, not_values_columns: list[str] = ['Country Code', 
                                                                         'Country Name', 
@@ -197,4 +440,4 @@ class AggregateTransformer(BaseTransformer):
                                                                         'Year', 
                                                                         'Population']):
         aggregate_operations = {col: 'mean' for col in self.df.columns if col not in not_values_columns}
-        self.continents_df = self.df.groupby(['Continent'], as_index=False).agg(aggregate_operations)
\ No newline at end of file
+        self.continents_df = self.df.groupby(['Continent'], as_index=False, observed=True).agg(aggregate_operations)
\ No newline at end of file
@@ -1,4 +1,10 @@
+from collections.abc import Iterable
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+# Path helpers are used by scripts that never touch a DataFrame, pandas is imported on first use
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 def ensure_data_directory(data_dir: Path) -> None:
@@ -41,4 +47,34 @@ def generate_output_path(config: dict, output_type: str, csv_file: str = None) -
     if output_type == 'db':
         return db_root_path / config['data_dir']['outputs']['database']
     elif output_type == 'csv' and csv_file:
-        return db_root_path / config['data_dir']['outputs']['csv'][csv_file]
\ No newline at end of file
+        return db_root_path / config['data_dir']['outputs']['csv'][csv_file]
+    elif output_type == 'columnar':
+        return db_root_path / config['data_dir']['outputs']['columnar']
+
+def concat_chunks(data: 'pd.DataFrame | Iterable[pd.DataFrame]') -> 'pd.DataFrame':
+    """Concatenate a stream of DataFrame chunks, keeping categorical columns categorical.
+
+    Args:
+        data (pd.DataFrame | Iterable[pd.DataFrame]): A DataFrame or an iterator of chunks
+
+    Returns:
+        pd.DataFrame: Concatenated DataFrame
+    """
+    import pandas as pd
+    from pandas.api.types import union_categoricals
+
+    if isinstance(data, pd.DataFrame):
+        return data
+
+    chunks = list(data)
+    if not chunks:
+        return pd.DataFrame()
+
+    # Chunks hold categoricals with different categories, which concat would turn into objects
+    for column, dtype in chunks[0].dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            categories = union_categoricals([chunk[column] for chunk in chunks]).categories
+            for chunk in chunks:
+                chunk[column] = chunk[column].cat.set_categories(categories)
+
+    return pd.concat(chunks, ignore_index=True)